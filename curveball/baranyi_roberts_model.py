@@ -10,7 +10,10 @@
 from __future__ import print_function
 from __future__ import division
 import sys
+import math
 import inspect
+import collections
+import contextlib
 from warnings import warn
 import numpy as np
 from scipy.optimize import minimize
@@ -19,6 +22,14 @@ import matplotlib.pyplot as plt
 import pandas as pd
 import lmfit
 import sympy
+try:
+	import numba
+except ImportError:
+	numba = None
+try:
+	import numexpr
+except ImportError:
+	numexpr = None
 import curveball
 from curveball.utils import smooth
 
@@ -72,6 +83,342 @@ def lag(model_result=None, q0=None, v=None):
 	return np.log(1.0 + 1.0 / q0) / v
 
 
+def _baranyi_roberts_loop(t, y0, K, r, nu, q0, v, has_lag, out):
+	"""Evaluate the Baranyi-Roberts model with finite `K` into `out`, one time point at a time.
+
+	Compiled with Numba, if available, so that the whole model is computed in a single pass over `t`
+	without the intermediate arrays of the NumPy implementation.
+	If `has_lag` is ``False``, `q0` and `v` are ignored and :math:`A(t)=t`.
+	"""
+	a = 1.0 - (K / y0)**nu
+	c = -r * nu
+	inv_nu = 1.0 / nu
+	log_q0 = math.log(q0) if has_lag else 0.0
+	log1pq0 = math.log1p(q0) if has_lag else 0.0
+	for i in range(t.size):
+		## FOR time point
+		ti = t[i]
+		if has_lag:
+			# log(exp(-vt) + q0) as in the NumPy implementation
+			At = ti + (max(-v * ti, log_q0) + math.log1p(math.exp(-abs(-v * ti - log_q0))) - log1pq0) / v
+		else:
+			At = ti
+		out[i] = K * (1.0 - a * math.exp(c * At))**(-inv_nu)
+		## FOR time point ENDS
+
+
+# fast-math flags without 'nnan' and 'ninf', as infinite q0, v and K are meaningful parameter values,
+# and trial parameter values of the fitting procedure can overflow the model to inf or NaN
+_FASTMATH_FLAGS = {'nsz', 'arcp', 'contract', 'afn', 'reassoc'}
+
+# Signatures of the compiled kernel, for double and single precision time arrays.
+# Compiling them eagerly with cache=True writes the machine code to Numba's cache on first import,
+# so that later imports, including in worker processes, load it instead of compiling again.
+# The kernels release the GIL (nogil), so that calls from several threads run concurrently.
+_KERNEL_SIGNATURES = [
+	'void({0}[:], float64, float64, float64, float64, float64, float64, boolean, {0}[:])'.format(dtype)
+	for dtype in ('float64', 'float32')
+]
+
+if numba is not None:
+	_baranyi_roberts_kernel = numba.njit(_KERNEL_SIGNATURES, nogil=True, fastmath=_FASTMATH_FLAGS, cache=True, error_model='numpy')(_baranyi_roberts_loop)
+else:
+	_baranyi_roberts_kernel = None
+
+
+def _logistic_loop(t, y0, K, r, q0, v, has_lag, out):
+	r"""Evaluate the Baranyi-Roberts model with finite `K` and :math:`\nu=1` into `out`, see :py:func:`_baranyi_roberts_loop`.
+
+	With :math:`\nu=1` the power in the model is a reciprocal, which is much cheaper.
+	This is used by the logistic models: :py:class:`LogisticLag2`, :py:class:`LogisticLag1` and :py:class:`Logistic`.
+	"""
+	a = 1.0 - K / y0
+	log_q0 = math.log(q0) if has_lag else 0.0
+	log1pq0 = math.log1p(q0) if has_lag else 0.0
+	for i in range(t.size):
+		## FOR time point
+		ti = t[i]
+		if has_lag:
+			# log(exp(-vt) + q0) as in the NumPy implementation
+			At = ti + (max(-v * ti, log_q0) + math.log1p(math.exp(-abs(-v * ti - log_q0))) - log1pq0) / v
+		else:
+			At = ti
+		out[i] = K / (1.0 - a * math.exp(-r * At))
+		## FOR time point ENDS
+
+
+if numba is not None:
+	_logistic_kernel = numba.njit([
+			'void({0}[:], float64, float64, float64, float64, float64, boolean, {0}[:])'.format(dtype)
+			for dtype in ('float64', 'float32')
+		], nogil=True, fastmath=_FASTMATH_FLAGS, cache=True, error_model='numpy')(_logistic_loop)
+else:
+	_logistic_kernel = None
+
+
+def _baranyi_roberts_point(t, y0, K, r, nu, q0, v, has_lag):
+	"""Evaluate the Baranyi-Roberts model at a single time point, see :py:func:`_baranyi_roberts_loop`.
+	"""
+	if has_lag:
+		# log(exp(-vt) + q0) as in baranyi_roberts_function
+		a, b = -v * t, math.log(q0)
+		At = t + (max(a, b) + math.log1p(math.exp(-abs(a - b))) - math.log1p(q0)) / v
+	else:
+		At = t
+	base = 1.0 - (1.0 - (K / y0)**nu) * math.exp(-r * nu * At)
+	if base <= 0:
+		return math.nan
+	return K * base**(-1.0 / nu)
+
+
+def _find_lag_loop(t, params, out):
+	"""Find the lag duration of the Baranyi-Roberts model for each row of `params` into `out`.
+
+	Each row of `params` holds y0, K, r, nu, q0 and v; an infinite v is replaced by r and an infinite q0 means no lag phase.
+	The lag is found as in :py:func:`curveball.models.find_lag`: 
+	in closed form for models without a lag phase, if the inflection point is within `t`, 
+	and otherwise from the tangent at the maximum derivative over the points of `t` above K/e,
+	with the derivative as in :py:func:`baranyi_roberts_derivative`.
+	Compiled with Numba, if available.
+	"""
+	tmin, tmax = t[0], t[-1]
+	for j in range(params.shape[0]):
+		## FOR sample
+		y0, K, r, nu, q0, v = params[j, 0], params[j, 1], params[j, 2], params[j, 3], params[j, 4], params[j, 5]
+		if math.isinf(v):
+			v = r
+		has_lag = not math.isinf(q0)
+		if not has_lag and not math.isinf(K) and K > y0:
+			t1 = math.log(((K / y0)**nu - 1.0) / nu) / (r * nu)
+			if tmin <= t1 <= tmax:
+				a = r * K * nu * (1.0 + nu)**(-1.0 - 1.0 / nu)
+				y1 = K * (1.0 + nu)**(-1.0 / nu)
+				out[j] = t1 + (y0 - y1) / a
+				continue
+		a = -math.inf
+		t1 = 0.0
+		y1 = 0.0
+		for i in range(t.size):
+			## FOR time point
+			y = _baranyi_roberts_point(t[i], y0, K, r, nu, q0, v, has_lag)
+			if y > K / math.e:
+				if has_lag:
+					alpha = 0.5 * (1.0 + math.tanh(0.5 * (v * t[i] + math.log(q0))))
+				else:
+					alpha = 1.0
+				dydt = r * alpha * y * (1.0 - (y / K)**nu)
+				if dydt > a:
+					a = dydt
+					t1 = t[i]
+					y1 = y
+			## FOR time point ENDS
+		if math.isinf(a):
+			out[j] = math.nan
+		else:
+			out[j] = (y0 - (y1 - a * t1)) / a
+		## FOR sample ENDS
+
+
+def _find_lag_batch(t, params):
+	"""Find the lag duration of the Baranyi-Roberts model for each row of `params`, see :py:func:`_find_lag_loop`.
+
+	All rows are evaluated at once with :py:func:`baranyi_roberts_batch`, for when Numba is not available.
+	"""
+	y0, K, r, nu, q0, v = params.T
+	y = baranyi_roberts_batch(t, y0, K, r, nu, q0, v)
+	# the derivative as in baranyi_roberts_derivative; K is finite wherever it is used, as y > K/e
+	_r, _nu, _q0, _K = (x[:, np.newaxis] for x in (r, nu, q0, K))
+	_v = np.where(np.isposinf(v), r, v)[:, np.newaxis]
+	with np.errstate(divide='ignore', invalid='ignore'):
+		alpha = np.where(np.isposinf(_q0), 1.0, 0.5 * (1.0 + np.tanh(0.5 * (_v * t + np.log(_q0)))))
+		dydt = _r * alpha * y * (1.0 - (y / _K)**_nu)
+	with np.errstate(invalid='ignore'):
+		dydt = np.where(y > K[:, np.newaxis] / np.e, dydt, -np.inf)
+	i = dydt.argmax(axis=1)
+	rows = np.arange(params.shape[0])
+	a, t1, y1 = dydt[rows, i], t[i], y[rows, i]
+	with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+		lags = np.where(np.isneginf(a), np.nan, (y0 - (y1 - a * t1)) / a)
+		# closed form for curves without a lag phase, as in find_lag
+		closed = np.isposinf(q0) & np.isfinite(K) & (K > y0)
+		t1 = np.log(((K / y0)**nu - 1.0) / nu) / (r * nu)
+		closed &= (t[0] <= t1) & (t1 <= t[-1])
+		a = r * K * nu * (1.0 + nu)**(-1.0 - 1.0 / nu)
+		y1 = K * (1.0 + nu)**(-1.0 / nu)
+		return np.where(closed, t1 + (y0 - y1) / a, lags)
+
+
+# not compiled with parallel=True: Numba's threading layer does not survive the fork of the worker processes of fit_model
+if numba is not None:
+	_baranyi_roberts_point = numba.njit(fastmath=_FASTMATH_FLAGS, cache=True, error_model='numpy')(_baranyi_roberts_point)
+	_find_lag_kernel = numba.njit('void(float64[:], float64[:, :], float64[:])', nogil=True, 
+		fastmath=_FASTMATH_FLAGS, cache=True, error_model='numpy')(_find_lag_loop)
+else:
+	_find_lag_kernel = None
+
+
+def _baranyi_roberts_jacobian_loop(t, y0, K, r, nu, q0, v, has_lag, out):
+	"""Evaluate the partial derivatives of the Baranyi-Roberts model with finite `K` into the rows of `out`, 
+	in the order y0, K, r, nu, q0 and v, one time point at a time; see :py:func:`baranyi_roberts_jacobian`.
+
+	If `has_lag` is ``False``, `q0` and `v` are ignored and their derivatives are zero.
+	"""
+	Ky0nu = (K / y0)**nu
+	a = 1.0 - Ky0nu
+	log_Ky0 = math.log(K / y0)
+	log_q0 = math.log(q0) if has_lag else 0.0
+	log1pq0 = math.log1p(q0) if has_lag else 0.0
+	for i in range(t.size):
+		## FOR time point
+		ti = t[i]
+		if has_lag:
+			w = math.exp(-v * ti)
+			# log(exp(-vt) + q0) as in the NumPy implementation
+			L = max(-v * ti, log_q0) + math.log1p(math.exp(-abs(-v * ti - log_q0))) - log1pq0
+			At = ti + L / v
+			dAdq0 = (1.0 / (w + q0) - 1.0 / (1.0 + q0)) / v
+			dAdv = -L / v**2 - ti * w / ((w + q0) * v)
+		else:
+			At = ti
+			dAdq0 = 0.0
+			dAdv = 0.0
+		E = math.exp(-r * nu * At)
+		B = 1.0 - a * E
+		y = K * B**(-1.0 / nu)
+		EB = E / B
+		dydA = -y * a * r * EB
+		out[0, i] = y * Ky0nu * EB / y0
+		out[1, i] = y / K * (1.0 - Ky0nu * EB)
+		out[2, i] = -y * a * At * EB
+		out[3, i] = y * (math.log(B) / nu**2 - EB * (Ky0nu * log_Ky0 + a * r * At) / nu)
+		out[4, i] = dydA * dAdq0
+		out[5, i] = dydA * dAdv
+		## FOR time point ENDS
+
+
+if numba is not None:
+	_baranyi_roberts_jacobian_kernel = numba.njit(
+		'void(float64[:], float64, float64, float64, float64, float64, float64, boolean, float64[:, :])', 
+		nogil=True, fastmath=_FASTMATH_FLAGS, cache=True, error_model='numpy')(_baranyi_roberts_jacobian_loop)
+else:
+	_baranyi_roberts_jacobian_kernel = None
+
+
+# The same model as _baranyi_roberts_loop, as numexpr expressions which are evaluated in a single
+# multi-threaded pass without compilation; used when Numba is not installed.
+# log(exp(-vt) + q0) is written as in the NumPy implementation, which doesn't underflow for large vt
+_NUMEXPR_LAG = 'K * (1.0 - a * exp(c * (t + (where(-v * t > log_q0, -v * t, log_q0) + log1p(exp(-abs(v * t + log_q0))) - log1pq0) / v)))**(-inv_nu)'
+_NUMEXPR_NO_LAG = 'K * (1.0 - a * exp(c * t))**(-inv_nu)'
+
+
+def _baranyi_roberts_numexpr(t, y0, K, r, nu, q0, v, has_lag):
+	"""Evaluate the Baranyi-Roberts model with finite `K` using numexpr.
+
+	If `has_lag` is ``False``, `q0` and `v` are ignored and :math:`A(t)=t`.
+	"""
+	local_dict = dict(t=t, K=K, a=1.0 - (K / y0)**nu, c=-r * nu, inv_nu=1.0 / nu)
+	if has_lag:
+		local_dict.update(v=v, log_q0=math.log(q0), log1pq0=math.log1p(q0))
+		y = numexpr.evaluate(_NUMEXPR_LAG, local_dict=local_dict)
+	else:
+		y = numexpr.evaluate(_NUMEXPR_NO_LAG, local_dict=local_dict)
+	return y.astype(t.dtype, copy=False)
+
+
+# Evaluations of baranyi_roberts_function memoized by _cached_evaluations, or None.
+_eval_cache = None
+
+
+@contextlib.contextmanager
+def _cached_evaluations(t, maxsize=4096):
+	"""Memoize evaluations of :py:func:`baranyi_roberts_function` on the time array `t` within the context.
+
+	Nested models evaluate the same parameter values during their fits to the same data, 
+	for example, the Logistic and Richards models at their common initial guess;
+	these are evaluated once and then copied from the cache.
+	Parameter values are compared exactly, so results do not change.
+
+	Parameters
+	----------
+	t : numpy.ndarray
+		the time array; evaluations on other arrays are not memoized
+	maxsize : int, optional
+		maximum number of memoized evaluations, the least recently used are discarded first
+	"""
+	global _eval_cache
+	previous = _eval_cache
+	_eval_cache = {'t': t, 'values': collections.OrderedDict(), 'maxsize': maxsize}
+	try:
+		yield
+	finally:
+		_eval_cache = previous
+
+
+def _baranyi_roberts_scalar(t, y0, K, r, nu, q0, v):
+	"""Evaluate the Baranyi-Roberts model at a single time point with the :py:mod:`math` module,
+	which is much faster than NumPy for scalars.
+
+	Returns ``None`` if the result is not a finite real number, in which case the caller should use NumPy.
+	"""
+	try:
+		if math.isinf(q0):
+			At = t
+		else:
+			# log(exp(-vt) + q0) as in the NumPy implementation
+			a, b = -v * t, math.log(q0)
+			At = t + (max(a, b) + math.log1p(math.exp(-abs(a - b))) - math.log1p(q0)) / v
+		if math.isinf(K):
+			return y0 * math.exp(r * nu * At)
+		base = 1.0 - (1.0 - (K / y0)**nu) * math.exp(-r * nu * At)
+	except (OverflowError, ValueError, ZeroDivisionError):
+		return None
+	if base <= 0:
+		return None
+	return K * base**(-1.0 / nu)
+
+
+def _baranyi_roberts_evaluate(t, y0, K, r, nu, q0, v):
+	"""Evaluate :py:func:`baranyi_roberts_function` without memoization.
+	"""
+	if np.isposinf(v):
+		v = r
+	if (not np.isposinf(K) and isinstance(t, np.ndarray) and t.ndim == 1 and t.dtype in (np.float32, np.float64)):
+		if _baranyi_roberts_kernel is not None:
+			out = np.empty_like(t)
+			if nu == 1.0:
+				_logistic_kernel(t, float(y0), float(K), float(r), float(q0), float(v), not np.isposinf(q0), out)
+				return out
+			_baranyi_roberts_kernel(t, float(y0), float(K), float(r), float(nu), float(q0), float(v), not np.isposinf(q0), out)
+			return out
+		if numexpr is not None:
+			return _baranyi_roberts_numexpr(t, float(y0), float(K), float(r), float(nu), float(q0), float(v), not np.isposinf(q0))
+	if isinstance(t, (float, int)):
+		y = _baranyi_roberts_scalar(t, y0, K, r, nu, q0, v)
+		if y is not None:
+			return y
+	if np.isposinf(q0):
+		At = t
+	else:
+		# log(exp(-vt) + q0) without materializing exp(-vt), which underflows for large vt
+		At = t + (np.logaddexp(-v * t, np.log(q0)) - np.log1p(q0)) / v
+	if np.isposinf(K):
+		return y0 * np.exp(r * nu * At)
+	else:
+		# scalar coefficients first, so that only exp and power are evaluated per time point
+		a = 1.0 - (K / y0)**nu
+		y = np.exp((-r * nu) * At)
+		if isinstance(y, np.ndarray):
+			# update in place rather than allocate a temporary per operation
+			y *= -a
+			y += 1.0
+			if nu == 1.0:
+				return np.divide(K, y, out=y)
+			np.power(y, -1.0 / nu, out=y)
+			y *= K
+			return y
+		return K * (1.0 - a * y)**(-1.0 / nu)
+
+
 def baranyi_roberts_function(t, y0, K, r, nu, q0, v):
 	r"""The Baranyi-Roberts growth model is an extension of the logistic and Richards model that adds a lag phase [Baranyi1994]_.
 
@@ -94,7 +441,8 @@ def baranyi_roberts_function(t, y0, K, r, nu, q0, v):
 	Parameters
 	----------
 	t : numpy.ndarray
-		array of floats for time, usually in hours (:math:`t>0`)
+		array of floats for time, usually in hours (:math:`t>0`); 
+		a :py:class:`numpy.float32` array is evaluated and returned in single precision, which is faster for large arrays.
 	y0 : float
 		initial population size (:math:`y_0>0`)
 	r : float
@@ -117,16 +465,157 @@ def baranyi_roberts_function(t, y0, K, r, nu, q0, v):
 	----------
 	.. [Baranyi1994] Baranyi, J., Roberts, T. A., 1994. `A dynamic approach to predicting bacterial growth in food <www.ncbi.nlm.nih.gov/pubmed/7873331>`_. Int. J. Food Microbiol.
 	"""
+	if _eval_cache is not None and t is _eval_cache['t']:
+		values = _eval_cache['values']
+		key = (y0, K, r, nu, q0, v)
+		if key in values:
+			values.move_to_end(key)
+		else:
+			if len(values) >= _eval_cache['maxsize']:
+				values.popitem(last=False)
+			values[key] = _baranyi_roberts_evaluate(t, y0, K, r, nu, q0, v)
+		return values[key].copy()
+	return _baranyi_roberts_evaluate(t, y0, K, r, nu, q0, v)
+
+
+def baranyi_roberts_batch(t, y0, K, r, nu, q0, v):
+	r"""Evaluate :py:func:`baranyi_roberts_function` for many parameter sets at once.
+
+	Each parameter can be a float or a one dimensional array with one value per parameter set;
+	all the parameter sets are evaluated in a single broadcast over the time points.
+	As in :py:func:`baranyi_roberts_function`, an infinite `q0` means no lag, an infinite `v` means :math:`v=r`,
+	and an infinite `K` means exponential growth.
+
+	Parameters
+	----------
+	t : numpy.ndarray
+		array of floats for time, usually in hours (:math:`t>0`)
+	y0, K, r, nu, q0, v : float or numpy.ndarray
+		model parameters, see :py:func:`baranyi_roberts_function`.
+
+	Returns
+	-------
+	numpy.ndarray
+		two dimensional array of population sizes;
+		the value at index `i, j` is for parameter set `i` and time point `t[j]`.
+	"""
+	t = np.asarray(t, dtype=float).reshape(1, -1)
+	y0, K, r, nu, q0, v = (np.asarray(x, dtype=float).reshape(-1, 1) for x in (y0, K, r, nu, q0, v))
+	v = np.where(np.isposinf(v), r, v)
+	with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+		At = np.where(np.isposinf(q0), t, t + (np.logaddexp(-v * t, np.log(q0)) - np.log1p(q0)) / v)
+		return np.where(
+			np.isposinf(K),
+			y0 * np.exp(r * nu * At),
+			K * (1.0 - (1.0 - (K / y0)**nu) * np.exp(-r * nu * At))**(-1.0 / nu)
+		)
+
+
+def baranyi_roberts_derivative(t, y0, K, r, nu, q0, v):
+	r"""The time derivative of :py:func:`baranyi_roberts_function`, from the model differential equation:
+
+	.. math::
+
+		\frac{dy}{dt} = r \alpha(t) y \Big( 1 - \Big(\frac{y}{K}\Big)^{\nu} \Big), \quad
+		\alpha(t) = \frac{q_0}{q_0 + e^{-v t}}
+
+	For an infinite `K` the model is :math:`y_0 e^{r \nu A(t)}`, and its derivative is :math:`r \nu \alpha(t) y`.
+
+	Parameters
+	----------
+	t : numpy.ndarray
+		array of floats for time, usually in hours (:math:`t>0`)
+	y0, K, r, nu, q0, v : float
+		model parameters, see :py:func:`baranyi_roberts_function`.
+
+	Returns
+	-------
+	numpy.ndarray
+		population growth rate per time point in `t`.
+	"""
+	if np.isposinf(v):
+		v = r
+	y = baranyi_roberts_function(t, y0, K, r, nu, q0, v)
+	if np.isposinf(q0):
+		alpha = 1.0
+	else:
+		# q0 / (q0 + exp(-vt)) as a logistic function, which does not overflow for large vt
+		alpha = 0.5 * (1.0 + np.tanh(0.5 * (v * t + np.log(q0))))
+	if np.isposinf(K):
+		return r * nu * alpha * y
+	return r * alpha * y * (1.0 - (y / K)**nu)
+
+
+def baranyi_roberts_jacobian(t, y0, K, r, nu, q0, v):
+	r"""Partial derivatives of :py:func:`baranyi_roberts_function` with respect to its parameters.
+
+	With :math:`a = 1 - (K/y_0)^{\nu}`, :math:`E = e^{-r \nu A(t)}` and :math:`B = 1 - a E`, so that :math:`y = K B^{-1/\nu}`:
+
+	.. math::
+
+		\frac{\partial y}{\partial r} = -\frac{y a A(t) E}{B}, \quad
+		\frac{\partial y}{\partial A} = -\frac{y a r E}{B}
+
+	and the derivatives with respect to :math:`q_0` and `v` follow from :math:`\partial A / \partial q_0` and :math:`\partial A / \partial v`.
+
+	Parameters
+	----------
+	t : numpy.ndarray
+		array of floats for time, usually in hours (:math:`t>0`)
+	y0, K, r, nu, q0, v : float
+		model parameters, see :py:func:`baranyi_roberts_function`.
+
+	Returns
+	-------
+	dict
+		mapping each parameter name to an array of partial derivatives per time point in `t`.
+		If `v` is infinite, it is set to `r`, and the derivative with respect to `v` is returned separately;
+		add it to the derivative with respect to `r` if the two are tied.
+	"""
+	t = np.asarray(t, dtype=float)
 	if np.isposinf(v):
 		v = r
+	if _baranyi_roberts_jacobian_kernel is not None and not np.isposinf(K) and t.ndim == 1:
+		out = np.empty((6, t.size))
+		_baranyi_roberts_jacobian_kernel(t, float(y0), float(K), float(r), float(nu), float(q0), float(v), not np.isposinf(q0), out)
+		return dict(zip(('y0', 'K', 'r', 'nu', 'q0', 'v'), out))
+	zeros = np.zeros_like(t)
 	if np.isposinf(q0):
 		At = t
+		dAdq0 = dAdv = zeros
 	else:
-		At = t + (1.0 / v) * np.log((np.exp(-v * t) + q0) / (1.0 + q0))
+		w = np.exp(-v * t)
+		L = np.logaddexp(-v * t, np.log(q0)) - np.log1p(q0)
+		At = t + L / v
+		dAdq0 = (1.0 / (w + q0) - 1.0 / (1.0 + q0)) / v
+		dAdv = -L / v**2 - t * w / ((w + q0) * v)
 	if np.isposinf(K):
-		return y0 * np.exp(r * nu * At)
+		y = y0 * np.exp(r * nu * At)
+		dydy0 = y / y0
+		dydK = zeros
+		dydr = y * nu * At
+		dydnu = y * r * At
+		dydA = y * r * nu
 	else:
-		return K / ((1 - (1 - (K / y0)**nu) * np.exp(-r * nu * At))**(1.0/nu))
+		Ky0nu = (K / y0)**nu
+		a = 1.0 - Ky0nu
+		E = np.exp(-r * nu * At)
+		B = 1.0 - a * E
+		y = K * B**(-1.0 / nu)
+		EB = E / B
+		dydy0 = y * Ky0nu * EB / y0
+		dydK = y / K * (1.0 - Ky0nu * EB)
+		dydr = -y * a * At * EB
+		dydnu = y * (np.log(B) / nu**2 - EB * (Ky0nu * np.log(K / y0) + a * r * At) / nu)
+		dydA = -y * a * r * EB
+	return {
+		'y0': dydy0,
+		'K': dydK,
+		'r': dydr,
+		'nu': dydnu,
+		'q0': dydA * dAdq0,
+		'v': dydA * dAdv
+	}
 
 
 def guess_nu(t, N, K=None, PLOT=False, PRINT=False):
@@ -275,12 +764,15 @@ def guess_r(t, N, nu=None, K=None, PLOT=False):
 	if nu is None:
 		nu = guess_nu(t, N, K, PLOT=False, PRINT=False)
 	
-	# smooth and calculate derivative
+	# smooth and calculate derivative by finite differences of the smooth curve between time points, 
+	# evaluating it once per time point rather than twice per measurement
 	N_smooth = smooth(t, N) 	
-	# calculate derivative	
-	dNdt = derivative(N_smooth, t)
+	t = np.unique(t)
+	N_t = N_smooth(t)
+	dNdt = np.diff(N_t) / np.diff(t)
+	t = (t[1:] + t[:-1]) / 2
 	# limit max search
-	idx = N >= K * np.exp(-1) / 4
+	idx = (N_t[1:] + N_t[:-1]) / 2 >= K * np.exp(-1) / 4
 	t, dNdt = t[idx], dNdt[idx]
 	i = dNdt.argmax()
 	dNdtmax = dNdt[i]
@@ -353,6 +845,28 @@ def guess_q0_v(t, N, param_guess, PLOT=False):
     return result.best_values['q0'], result.best_values['v']
 
 
+# The nested models are defined at module level, rather than as closures,
+# so that models and model fits can be pickled, e.g. to send them between processes.
+def _richards_function(t, y0, K, r, nu):
+	return baranyi_roberts_function(t, y0, K, r, nu, np.inf, np.inf)
+
+
+def _richards_lag1_function(t, y0, K, r, nu, q0):
+	return baranyi_roberts_function(t, y0, K, r, nu, q0, r)
+
+
+def _logistic_lag2_function(t, y0, K, r, q0, v):
+	return baranyi_roberts_function(t, y0, K, r, 1.0, q0, v)
+
+
+def _logistic_lag1_function(t, y0, K, r, q0):
+	return baranyi_roberts_function(t, y0, K, r, 1.0, q0, r)
+
+
+def _logistic_function(t, y0, K, r):
+	return baranyi_roberts_function(t, y0, K, r, 1.0, np.inf, np.inf)
+
+
 class BaranyiRoberts(lmfit.model.Model):
 	"""The Baranyi-Roberts growth model is an extension of the logistic and Richards model that adds a lag phase.	
 	"""
@@ -444,6 +958,61 @@ class BaranyiRoberts(lmfit.model.Model):
 		return params
 
 
+	def eval_jacobian(self, params, t):
+		"""Evaluate the partial derivatives of the model function with respect to the model parameters.
+
+		Parameters
+		----------
+		params : lmfit.parameter.Parameters
+			the model parameters, possibly created by :py:meth:`guess`.
+		t : numpy.ndarray
+			time, usually in hours
+
+		Returns
+		-------
+		dict
+			mapping each of the model parameter names to an array of partial derivatives per time point in `t`.
+
+		See also
+		--------
+		curveball.baranyi_roberts_model.baranyi_roberts_jacobian
+		"""
+		values = {name: params[name].value for name in self.param_names}
+		r = values['r']
+		q0 = values.get('q0', np.inf)
+		v = values.get('v', r if np.isfinite(q0) else np.inf)
+		jac = baranyi_roberts_jacobian(t, values['y0'], values.get('K', np.inf), r, values.get('nu', 1.0), q0, v)
+		if 'v' not in self.param_names:
+			jac['r'] = jac['r'] + jac['v'] # v is tied to r
+		return {name: jac[name] for name in self.param_names}
+
+
+	def eval_derivative(self, params, t):
+		"""Evaluate the time derivative of the model function.
+
+		Parameters
+		----------
+		params : lmfit.parameter.Parameters
+			the model parameters, possibly created by :py:meth:`guess`.
+		t : numpy.ndarray
+			time, usually in hours
+
+		Returns
+		-------
+		numpy.ndarray
+			the population growth rate per time point in `t`.
+
+		See also
+		--------
+		curveball.baranyi_roberts_model.baranyi_roberts_derivative
+		"""
+		values = {name: params[name].value for name in self.param_names}
+		r = values['r']
+		q0 = values.get('q0', np.inf)
+		v = values.get('v', r if np.isfinite(q0) else np.inf)
+		return baranyi_roberts_derivative(t, values['y0'], values.get('K', np.inf), r, values.get('nu', 1.0), q0, v)
+
+
 	def get_sympy_expr(self, params):
 		"""Generate the required variables for creating a Dfun to be used in the fitting procedure.
 
@@ -517,20 +1086,50 @@ class Richards(BaranyiRoberts):
 	.. [Gilpin1973] Gilpin, Michael E., and Francisco J. Ayala. 1973. "Global Models of Growth and Competition." Proceedings of the National Academy of Sciences of the United States of America 70 (12 Pt 1-2): 3590–3593. doi:10.1073/pnas.70.12.3590.
 	"""
 	def __init__(self, *args, **kwargs):
-		def func(t, y0, K, r, nu):			
-			return baranyi_roberts_function(t, y0, K, r, nu, np.inf, np.inf)
-		super(Richards, self).__init__(func, *args, **kwargs)
+		super(Richards, self).__init__(_richards_function, *args, **kwargs)
 		self.nested_models = {
 			'nu': Logistic
 		}
 
+	def analytic_max_growth(self, params, t_min, t_max):
+		r"""Calculate the maximum population and per capita growth rates in closed form.
+
+		Without a lag phase, the population growth rate :math:`r y (1 - (y/K)^{\nu})` is maximal at 
+		:math:`y_1 = K (1 + \nu)^{-1/\nu}`, and the per capita growth rate is maximal at the start of the time range.
+
+		Parameters
+		----------
+		params : lmfit.parameter.Parameters
+			the model parameters.
+		t_min, t_max : float
+			the time range in which to find the maxima.
+
+		Returns
+		-------
+		tuple or None
+			`t1, y1, a, t2, y2, mu` as returned by :py:func:`curveball.models.find_max_growth`, 
+			or :const:`None` if the maximum population growth rate is not realized inside the time range.
+		"""
+		y0, K, r = params['y0'].value, params['K'].value, params['r'].value
+		nu = params['nu'].value if 'nu' in params else 1.0
+		if not (np.isfinite(K) and 0 < y0 < K and r > 0 and nu > 0):
+			return None
+		t1 = np.log(((K / y0)**nu - 1.0) / nu) / (r * nu)
+		if not t_min <= t1 <= t_max:
+			return None
+		y1 = K * (1.0 + nu)**(-1.0 / nu)
+		a = r * K * nu * (1.0 + nu)**(-1.0 - 1.0 / nu)
+		t2 = t_min
+		y2 = float(baranyi_roberts_function(t2, y0, K, r, nu, np.inf, np.inf))
+		mu = r * (1.0 - (y2 / K)**nu)
+		return t1, y1, a, t2, y2, mu
+
+
 class RichardsLag1(BaranyiRoberts):
 	r"""This is an extension of the :py:class:`Richards` that includes a single lag parameter :math:`q_0` (and sets :math:`v=r`).
 	"""
 	def __init__(self, *args, **kwargs):
-		def func(t, y0, K, r, nu, q0): 
-			return baranyi_roberts_function(t, y0, K, r, nu, q0, r)
-		super(RichardsLag1, self).__init__(func, *args, **kwargs)
+		super(RichardsLag1, self).__init__(_richards_lag1_function, *args, **kwargs)
 		self.nested_models = {
 			'nu': LogisticLag1,
 			'lag': Richards
@@ -540,9 +1139,7 @@ class LogisticLag2(BaranyiRoberts):
 	r"""This is an extension of the :py:class:`Logistic` model that includes a two lag parameters :math:`q_0` and :math:`v`).	
 	"""
 	def __init__(self, *args, **kwargs):
-		def func(t, y0, K, r, q0, v): 
-			return baranyi_roberts_function(t, y0, K, r, 1.0, q0, v)
-		super(LogisticLag2, self).__init__(func, *args, **kwargs)
+		super(LogisticLag2, self).__init__(_logistic_lag2_function, *args, **kwargs)
 		self.nested_models = {
 			'lag': Logistic
 		}
@@ -551,9 +1148,7 @@ class LogisticLag1(BaranyiRoberts):
 	r"""This is an extension of the :py:class:`Logistic` that includes a single lag parameter :math:`q_0` (and sets :math:`v=r`).
 	"""
 	def __init__(self, *args, **kwargs):
-		def func(t, y0, K, r, q0):
-			return baranyi_roberts_function(t, y0, K, r, 1.0, q0, r)
-		super(LogisticLag1, self).__init__(func, *args, **kwargs)
+		super(LogisticLag1, self).__init__(_logistic_lag1_function, *args, **kwargs)
 		self.nested_models = {
 			'lag': Logistic
 		}
@@ -570,11 +1165,11 @@ class Logistic(BaranyiRoberts):
 	`Wikipedia <https://en.wikipedia.org/wiki/Logistic_function#In_ecology:_modeling_population_growth>`_
 	"""
 	def __init__(self, *args, **kwargs):
-		def func(t, y0, K, r):
-			return baranyi_roberts_function(t, y0, K, r, 1.0, np.inf, np.inf)
-		super(Logistic, self).__init__(func, *args, **kwargs)
+		super(Logistic, self).__init__(_logistic_function, *args, **kwargs)
 		self.nested_models = {}
 
+	analytic_max_growth = Richards.analytic_max_growth
+
 
 if __name__ == '__main__':
 	def nvarys(params): 
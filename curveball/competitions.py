@@ -624,9 +624,11 @@ def fit_and_compete(m1, m2, df_mixed, y0=None, aguess=(1, 1), fixed=False,
     if y0 is None:
         y0 = best_values1['y0']/2, best_values2['y0']/2
 
-    y_mixed = df_mixed.groupby(time_var)[value_var].mean().as_matrix()
-    y_mixed_std = df_mixed.groupby(time_var)[value_var].std().as_matrix()
-    t_mixed = np.unique(df_mixed[time_var])
+    # mean and std at each time point from a single groupby; the group keys are the sorted unique times
+    mixed = df_mixed.groupby(time_var)[value_var].agg(['mean', 'std'])
+    y_mixed = mixed['mean'].values
+    y_mixed_std = mixed['std'].values
+    t_mixed = mixed.index.values
     t = np.linspace(0, t_mixed.max(), num_of_points)
 
     if fixed:
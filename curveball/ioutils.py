@@ -9,26 +9,28 @@
 # Copyright (c) 2015, Yoav Ram <yoav@yoavram.com>
 from __future__ import print_function
 from __future__ import division
-from builtins import zip
-from builtins import str
-from builtins import filter
-from builtins import map
-from builtins import range
-from six import string_types
-from past.utils import old_div
 import numpy as np
 import pandas as pd
 from string import ascii_uppercase
 from scipy.io import loadmat
+from lxml import etree
 import re
 import datetime
 import dateutil.parser
 from glob import glob
+from concurrent.futures import ThreadPoolExecutor
+import functools
+import hashlib
+import os
 import os.path
 from warnings import warn
 
 
 MAT_VERSION = u'1.0'
+TECAN_DATETIME_FORMAT = u'%d/%m/%Y %H:%M:%S'
+CACHE_DIR = os.environ.get(u'CURVEBALL_CACHE_DIR', os.path.join(os.path.expanduser(u'~'), u'.cache', u'curveball'))
+# compiled once, used by read_tecan_xml for every well
+_WELL_VALUE_XPATH = etree.XPath(u"string()")
 
 
 def _fix_dtypes(df):
@@ -44,12 +46,142 @@ def _fix_dtypes(df):
     None
     """
     if u'Strain' in df.columns:
-        df[u'Strain'] = df[u'Strain'].astype(str)
+        if isinstance(df[u'Strain'].dtype, pd.CategoricalDtype):
+            df[u'Strain'] = df[u'Strain'].cat.rename_categories(str)
+        else:
+            df[u'Strain'] = df[u'Strain'].astype(str)
     for col in df.columns:
         if df[col].dtype == object:
             df[col] = df[col].astype(str)
     
 
+def _parse_wells(wells):
+    """Parse well names such as ``A1`` into rows and columns, parsing each distinct well name once.
+
+    Parameters
+    ----------
+    wells : pandas.Series
+        well names, usually repeated for every time point.
+
+    Returns
+    -------
+    rows : pandas.Categorical
+        the row letters, with sorted categories.
+    cols : numpy.ndarray
+        the column numbers as ``int16``.
+    """
+    wells = pd.Categorical(wells)
+    names = pd.Series(wells.categories)
+    row_codes, row_names = pd.factorize(names.str[0], sort=True)
+    rows = pd.Categorical.from_codes(row_codes[wells.codes], categories=row_names)
+    cols = names.str.slice(1).astype(np.int16).values[wells.codes]
+    return rows, cols
+
+
+def _merge_plate(df, plate):
+    """Merge a plate layout into a data frame of measurements.
+
+    The ``Row`` and ``Col`` keys of both frames are cast to ``category`` and ``int16``
+    so that the join stays on pandas' fast hash path.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        data frame of measurements with ``Row`` and ``Col`` columns.
+    plate : pandas.DataFrame
+        data frame representing a plate, usually generated by reading a CSV file generated by `Plato <http://plato.yoavram.com/>`_.
+
+    Returns
+    -------
+    pandas.DataFrame
+    """
+    keys = {u'Row': 'category', u'Col': np.int16}
+    df = df.astype(keys, copy=False)
+    plate = plate.astype(keys)
+    df = pd.merge(df, plate, on=(u'Row', u'Col'), sort=False, copy=False)
+    for col in (u'Strain', u'Color'):
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    return df
+
+
+def _set_default_strain(df):
+    """Assign all wells to strain ``0`` with a black color, when no plate is given.
+
+    Both columns are stored as single-category categoricals, which take one byte per row.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        data frame to update in place.
+
+    Returns
+    -------
+    None
+    """
+    codes = np.zeros(len(df), dtype=np.int8)
+    df[u'Strain'] = pd.Categorical.from_codes(codes, categories=[u'0'])
+    df[u'Color'] = pd.Categorical.from_codes(codes, categories=[u'#000000'])
+
+
+def _cache_key(func, filename, args, kwargs):
+    """Hash a reader call, including the modification time of the files it reads.
+
+    Parameters
+    ----------
+    func : callable
+        the reader function.
+    filename : str
+        path to the file, or a glob pattern.
+    args, kwargs : tuple, dict
+        the other arguments of the call; data frames (e.g. `plate`) are hashed by content.
+
+    Returns
+    -------
+    str
+        hex digest identifying the call.
+    """
+    h = hashlib.blake2b(func.__name__.encode(), digest_size=16)
+    for fn in sorted(glob(filename)) or [filename]:
+        h.update(os.path.abspath(fn).encode())
+        if os.path.exists(fn):
+            st = os.stat(fn)
+            h.update(repr((st.st_mtime_ns, st.st_size)).encode())
+    for key, value in [(None, x) for x in args] + sorted(kwargs.items()):
+        h.update(repr(key).encode())
+        if isinstance(value, pd.DataFrame):
+            h.update(repr(value.columns.tolist()).encode())
+            h.update(pd.util.hash_pandas_object(value).values.tobytes())
+        else:
+            h.update(repr(value).encode())
+    return h.hexdigest()
+
+
+def _cached(func):
+    """Decorate a reader with an opt-in on-disk cache of its output, controlled by a `cache` keyword argument.
+
+    Cached data frames are pickled to :py:data:`CACHE_DIR`, keyed by the reader arguments and the modification time of the files read.
+    """
+    @functools.wraps(func)
+    def wrapper(filename, *args, **kwargs):
+        cache = kwargs.pop(u'cache', None)
+        if cache is None:
+            cache = os.environ.get(u'CURVEBALL_CACHE', u'') not in (u'', u'0')
+        if not cache:
+            return func(filename, *args, **kwargs)
+        path = os.path.join(CACHE_DIR, _cache_key(func, filename, args, kwargs) + u'.pkl')
+        if os.path.exists(path):
+            return pd.read_pickle(path)
+        df = func(filename, *args, **kwargs)
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = u'{0}.{1}.tmp'.format(path, os.getpid())
+        df.to_pickle(tmp_path)
+        os.replace(tmp_path, path)
+        return df
+    return wrapper
+
+
+@_cached
 def read_curveball_csv(filename, max_time=None, plate=None):
     """Reads growth measurements from a Curveball csv (comma separated values) file.
 
@@ -59,6 +191,9 @@ def read_curveball_csv(filename, max_time=None, plate=None):
         path to the file.
     plate : pandas.DataFrame, optional
         data frame representing a plate, usually generated by reading a CSV file generated by `Plato <http://plato.yoavram.com/>`_.
+    cache : bool, optional
+        if ``True``, the parsed data frame is stored in :py:data:`CACHE_DIR` and reused as long as the file is not modified;
+        defaults to ``True`` if the ``CURVEBALL_CACHE`` environment variable is set.
 
     Returns
     -------
@@ -92,6 +227,111 @@ def write_curveball_csv(df, filename):
     df.to_csv(filename, index=False, encoding='utf8')
 
 
+def _parse_tecan_date(row, next_row, default, sheet_name, i):
+    """Parse the date and time of a measurement from the ``Date:`` and ``Time:`` rows of a Tecan worksheet.
+
+    Parameters
+    ----------
+    row : tuple
+        values of the row starting with ``Date``.
+    next_row : tuple
+        values of the row following `row`, expected to start with ``Time``.
+    default : datetime.datetime
+        value to return if the date could not be parsed.
+    sheet_name : str
+        name of the worksheet, used for warnings.
+    i : int
+        index of `row` in the worksheet, used for warnings.
+
+    Returns
+    -------
+    datetime.datetime
+    """
+    has_time = isinstance(next_row[0], str) and next_row[0].startswith(u'Time')
+    if not has_time:
+        warn(u"Warning: time row missing (sheet '{0}', row{1}), found row starting with {2}".format(sheet_name, i, next_row[0]))
+    if isinstance(row[1], str):
+        date = ''.join(x for x in row[1:] if isinstance(x, str))
+        time = ''.join(x for x in next_row[1:] if isinstance(x, str)) if has_time else ''
+        try:
+            return datetime.datetime.strptime("%s %s" % (date, time), TECAN_DATETIME_FORMAT)
+        except ValueError: # other locale
+            return dateutil.parser.parse("%s %s" % (date, time))
+    elif isinstance(row[1], datetime.datetime):
+        if not has_time:
+            return row[1]
+        time = next_row[1]
+        if isinstance(time, str):
+            time = datetime.time(*[int(x) for x in time.split(':')][:3])
+        return datetime.datetime.combine(row[1].date(), time)
+    warn(u"Warning: date row (sheet '{2}', row {3}) could not be parsed: {0} {1}".format(row[1], type(row[1]), sheet_name, i))
+    return default
+
+
+def _read_tecan_blocks(wb, sheets, labels, filename):
+    """Collect the data tables of a Tecan Infinity workbook in a single pass over its rows.
+
+    Parameters
+    ----------
+    wb : openpyxl.Workbook
+        workbook opened in read-only mode.
+    sheets : sequence of int
+        indices of the sheets to read.
+    labels : sequence of str
+        titles of the data tables to collect.
+    filename : str
+        path to the file, used for error messages.
+
+    Returns
+    -------
+    dict
+        maps each label to a list with one ``(dateandtime, names, rows)`` tuple per non-empty sheet,
+        where `names` holds the first cell of each row in the table and `rows` the remaining cells.
+
+    Raises
+    ------
+    ValueError
+        if a non-empty sheet has no data for one of the labels.
+    """
+    dateandtime = datetime.datetime.now() # default
+    blocks = {lbl: [] for lbl in labels}
+    for sh_i in sheets:
+        sh = wb.worksheets[sh_i]
+        empty = True
+        found = {}
+        names = None # the table currently being read
+        date_row = None
+        for i, row in enumerate(sh.iter_rows(values_only=True)):
+            ## FOR row
+            empty = empty and all(x is None for x in row)
+            if names is not None:
+                if row[0]:
+                    names.append(row[0])
+                    rows.append(row[1:])
+                    continue
+                names = None # end of table
+            if date_row is not None:
+                dateandtime = _parse_tecan_date(date_row, row, dateandtime, sh.title, i - 1)
+                date_row = None
+            if isinstance(row[0], str) and row[0].startswith(u'Date'):
+                date_row = row
+            elif row[0] in blocks and row[0] not in found:
+                names = []
+                rows = []
+                found[row[0]] = (dateandtime, names, rows)
+            ## FOR row ENDS
+        if date_row is not None: # date row was the last row
+            dateandtime = _parse_tecan_date(date_row, (None,), dateandtime, sh.title, i)
+        if empty:
+            continue # to next sheet
+        for lbl in labels:
+            if lbl not in found or not found[lbl][1]:
+                raise ValueError("No data found in sheet {1} of workbook {0}".format(filename, sh_i))
+            blocks[lbl].append(found[lbl])
+    return blocks
+
+
+@_cached
 def read_tecan_xlsx(filename, label=u'OD', sheets=None, max_time=None, plate=None, PRINT=False):
     """Reads growth measurements from a Tecan Infinity Excel output file.
 
@@ -107,6 +347,9 @@ def read_tecan_xlsx(filename, label=u'OD', sheets=None, max_time=None, plate=Non
         maximal time in hours, defaults to infinity
     plate : pandas.DataFrame, optional
         data frame representing a plate, usually generated by reading a CSV file generated by `Plato <http://plato.yoavram.com/>`_.
+    cache : bool, optional
+        if ``True``, the parsed data frame is stored in :py:data:`CACHE_DIR` and reused as long as the file is not modified;
+        defaults to ``True`` if the ``CURVEBALL_CACHE`` environment variable is set.
 
     Returns
     -------
@@ -137,91 +380,64 @@ def read_tecan_xlsx(filename, label=u'OD', sheets=None, max_time=None, plate=Non
     >>> df.shape
     (8544, 9)
     """
-    import xlrd
-    wb = xlrd.open_workbook(filename)
-    dateandtime = datetime.datetime.now() # default
+    import openpyxl
+    wb = openpyxl.load_workbook(filename, read_only=True, data_only=True)
 
-    if isinstance(label, string_types):
+    if isinstance(label, str):
         label = [label]
     if sheets is None:
-        sheets = range(wb.nsheets)
+        sheets = range(len(wb.worksheets))
     if PRINT: print("Reading {0} worksheets from workbook {1}".format(len(sheets), filename))
+    try:
+        blocks = _read_tecan_blocks(wb, sheets, label, filename)
+    finally:
+        wb.close()
+
     label_dataframes = []
     for lbl in label:
         sheet_dataframes = []        
         ## FOR sheet
-        for sh_i in sheets:
-            sh = wb.sheet_by_index(sh_i)
-            if sh.nrows == 0:
-                continue # to next sheet
-        
-            for i in range(sh.nrows):
-                ## FOR row
-                row = sh.row_values(i)
-                if row[0].startswith(u'Date'):
-                    if isinstance(row[1], string_types):
-                        date = ''.join(row[1:])
-                        next_row = sh.row_values(i + 1)
-                        if next_row[0].startswith(u'Time'):
-                            time = ''.join(next_row[1:])
-                        else:
-                            warn(u"Warning: time row missing (sheet '{0}', row{1}), found row starting with {2}".format(sh.name, i, row[0]))
-                        dateandtime = dateutil.parser.parse("%s %s" % (date, time))
-                    elif isinstance(row[1], float):
-                        date_tuple = xlrd.xldate_as_tuple(row[1], wb.datemode)
-                        next_row = sh.row_values(i + 1)
-                        if next_row[0].startswith(u'Time'):
-                            time = tuple(map(int, next_row[1].split(':')))[:3]
-                            date_tuple = date_tuple[:3] + time
-                        else:
-                            warn(u"Warning: time row missing (sheet '{0}', row{1}), found row starting with {2}".format(sh.name, i, row[0]))
-                        dateandtime = datetime.datetime(*date_tuple)
-                    else:
-                        warn(u"Warning: date row (sheet '{2}', row {3}) could not be parsed: {0} {1}".format(row[1], type(row[1]), sh.name, i))
-                if row[0] == lbl:
-                    break
-                ## FOR row ENDS
-            
-            data = {}            
-            for j in range(i + 1, sh.nrows):
-                ## FOR row
-                row = sh.row(j)
-                if not row[0].value:
-                    break
-                data[row[0].value] = [x.value for x in row[1:] if x.ctype == 2]
-                ## FOR row ENDS
-
-            if not data:
-                raise ValueError("No data found in sheet {1} of workbook {0}".format(filename, sh_i))
-
-            min_length = min(map(len, data.values()))
-            for k,v in data.items():
-                data[k] =  v[:min_length]
-
-            df = pd.DataFrame(data)
-            df = pd.melt(df, id_vars=(u'Time [s]', u'Temp. [°C]', u'Cycle Nr.'), var_name=u'Well', value_name=lbl)
+        for dateandtime, names, rows in blocks[lbl]:
+            # the first row of a table holds the cycle numbers, which fixes its width
+            width = len(rows[0])
+            while width and rows[0][width - 1] is None:
+                width -= 1
+            data = np.full((len(rows), width), np.nan)
+            for i, row in enumerate(rows):
+                row = row[:width]
+                try:
+                    data[i, :len(row)] = row
+                except (TypeError, ValueError): # non-numeric cells, e.g. OVER
+                    data[i, :len(row)] = [x if isinstance(x, (int, float)) else np.nan for x in row]
+            # keep only the cycles measured in all rows
+            n_cycles = (~np.isnan(data)).sum(axis=1).min()
+
+            df = pd.DataFrame(data[:, :n_cycles].T, columns=names)
             df.rename(columns={u'Time [s]': u'Time'}, inplace=True)
-            df.Time = [dateandtime + datetime.timedelta(0, t) for t in df.Time]        
-            df[u'Row'] = [x[0] for x in df.Well]
-            df[u'Col'] = [int(x[1:]) for x in df.Well]
+            df[u'Time'] = pd.to_datetime(dateandtime) + pd.to_timedelta(df[u'Time'], unit='s')
             sheet_dataframes.append(df)
         ## FOR sheet ENDS
 
-        n_sheet_dataframes = len(sheet_dataframes)
-        if n_sheet_dataframes == 0:
-            df = pd.DataFrame()
-        elif n_sheet_dataframes == 1:
-            df = sheet_dataframes[0]
-        else:
-            df = pd.concat(sheet_dataframes)
+        if not sheet_dataframes:
+            continue # to next label
 
-        min_time = df.Time.min()
+        # trim the wide tables to max_time before melting them
+        min_time = min(df.Time.min() for df in sheet_dataframes)
         if PRINT:
             print("Starting time", min_time)
-        df.Time = [(t - min_time).total_seconds() / 3600.0 for t in df.Time]
-        if max_time is not None:
-            df = df[df.Time <= max_time]
-        df.sort_values([u'Row', u'Col', u'Time'], inplace=True)
+        for j, df in enumerate(sheet_dataframes):
+            df[u'Time'] = (df[u'Time'] - min_time).dt.total_seconds() / 3600.0
+            if max_time is not None:
+                df = df[df.Time <= max_time]
+            df = pd.melt(df, id_vars=(u'Time', u'Temp. [°C]', u'Cycle Nr.'), var_name=u'Well', value_name=lbl)
+            df[u'Row'], df[u'Col'] = _parse_wells(df[u'Well'])
+            sheet_dataframes[j] = df
+
+        if len(sheet_dataframes) == 1:
+            df = sheet_dataframes[0]
+        else:
+            df = pd.concat(sheet_dataframes)
+        df = df.sort_values([u'Row', u'Col', u'Time'], kind='stable', ignore_index=True)
         label_dataframes.append((lbl,df))
 
     n_label_dataframes = len(label_dataframes)
@@ -235,17 +451,17 @@ def read_tecan_xlsx(filename, label=u'OD', sheets=None, max_time=None, plate=Non
         lbl = '_' + lbl
         for lbli, dfi in label_dataframes[1:]:
             lbli = '_' + lbli
-            df = pd.merge(df, dfi, on=(u'Cycle Nr.', u'Well', u'Row', u'Col'), suffixes=(lbl,lbli))
+            df = pd.merge(df, dfi, on=(u'Cycle Nr.', u'Well', u'Row', u'Col'), suffixes=(lbl,lbli), sort=False, copy=False)
     if plate is None:
-        df[u'Strain'] = u'0'
-        df[u'Color'] = u'#000000'
+        _set_default_strain(df)
     else:
-        df = pd.merge(df, plate, on=(u'Row', u'Col'))
+        df = _merge_plate(df, plate)
     if PRINT: print("Read {0} records from workbook".format(df.shape[0]))
     _fix_dtypes(df)
     return df
 
 
+@_cached
 def read_tecan_mat(filename, time_label=u'tps', value_label=u'plate_mat', value_name=u'OD', plate_width=12, max_time=None, plate=None):
     """Reads growth measurements from a Matlab file generated by a propriety script at the *Pilpel lab*.
 
@@ -263,6 +479,9 @@ def read_tecan_mat(filename, time_label=u'tps', value_label=u'plate_mat', value_
         maximal time in hours, defaults to infinity
     plate : pandas.DataFrame, optional
         data frame representing a plate, usually generated by reading a CSV file generated by `Plato <http://plato.yoavram.com/>`_.
+    cache : bool, optional
+        if ``True``, the parsed data frame is stored in :py:data:`CACHE_DIR` and reused as long as the file is not modified;
+        defaults to ``True`` if the ``CURVEBALL_CACHE`` environment variable is set.
 
     Returns
     -------
@@ -286,28 +505,138 @@ def read_tecan_mat(filename, time_label=u'tps', value_label=u'plate_mat', value_
     y = mat[value_label]
     assert y.shape[1] == t.shape[0]
 
-    df = pd.DataFrame(y.T, columns=np.arange(y.shape[0]) + 1)
-    df[u'Time'] = old_div(t, 3600.)
-    df[u'Cycle Nr.'] = np.arange(1, 1 + len(t))
-    df = pd.melt(df, id_vars=(u'Cycle Nr.', u'Time'), var_name=u'Well', value_name=value_name)
-    df[u'Well'] = [ascii_uppercase[old_div((int(w) - 1), plate_width)] + str(w % plate_width if w % plate_width > 0 else plate_width) for w in df[u'Well']]
-    df[u'Row'] = [w[0] for w in df[u'Well']]
-    df[u'Col'] = [int(w[1:]) for w in df[u'Well']]
+    t = t / 3600.
+    if not max_time:
+        max_time = t.max()
+    cycles = np.flatnonzero(t < max_time)
+
+    # long format, one row per well per cycle, without going through pd.melt
+    n_wells = y.shape[0]
+    well = np.repeat(np.arange(n_wells), len(cycles))
+    rows = np.array(list(ascii_uppercase))[well // plate_width]
+    cols = (well % plate_width + 1).astype(np.int16)
+    df = pd.DataFrame({
+        u'Cycle Nr.': np.tile(cycles + 1, n_wells),
+        u'Time': np.tile(t[cycles], n_wells),
+        u'Well': np.char.add(rows, cols.astype(str)),
+        value_name: y[:, cycles].ravel(),
+        u'Row': pd.Categorical(rows),
+        u'Col': cols,
+    })
     
     if plate is None:
-        df[u'Strain'] = u'0'
-        df[u'Color'] = u'#000000'
+        _set_default_strain(df)
     else:
-        df = pd.merge(df, plate, on=(u'Row', u'Col'))
-    if not max_time:
-        max_time = df.Time.max()
-    df = df[df.Time < max_time]
-    df.sort_values([u'Row', u'Col', u'Time'], inplace=True)    
+        df = _merge_plate(df, plate)
+    df = df.sort_values([u'Row', u'Col', u'Time'], kind='stable', ignore_index=True)
     _fix_dtypes(df)
     return df
 
 
-def read_tecan_xml(filename, label=u'OD', max_time=None, plate=None):
+def _concat(dataframes, backend=u'pandas'):
+    """Concatenate the data frames parsed from multiple files.
+
+    Parameters
+    ----------
+    dataframes : list of pandas.DataFrame
+        data frames to concatenate.
+    backend : str, optional
+        ``pandas`` or ``modin``; with ``modin`` the concatenation runs in parallel and the result is converted back to a pandas data frame.
+
+    Returns
+    -------
+    pandas.DataFrame
+        the concatenated data frame, with a new range index.
+
+    Raises
+    ------
+    ValueError
+        if `backend` is unknown.
+    """
+    if backend == u'pandas':
+        return pd.concat(dataframes, copy=False, ignore_index=True)
+    elif backend == u'modin':
+        import modin.pandas as mpd
+        from modin.utils import to_pandas
+        return to_pandas(mpd.concat([mpd.DataFrame(df) for df in dataframes], ignore_index=True))
+    raise ValueError("Unknown backend {0}, expected pandas or modin".format(backend))
+
+
+def _iter_xml_wells(f, label, section):
+    """Iterate over the wells of a measurement section of a Tecan Infinity XML file without building the whole tree.
+
+    Parameters
+    ----------
+    f : file
+        XML file opened in binary mode.
+    label : str
+        measurment name used as ``Name`` in the measurement sections in the file.
+    section : dict
+        updated with the attributes of the section named `label`, if found.
+
+    Yields
+    ------
+    tuple
+        the well position and its measured value.
+    """
+    section_node = None
+    for event, node in etree.iterparse(f, events=(u'start', u'end'), tag=(u'Section', u'Well')):
+        ## FOR node
+        if node.tag == u'Section':
+            if event == u'start':
+                if node.get(u'Name') == label:
+                    section_node = node
+                    section.update(node.attrib)
+            elif section_node is not None:
+                break # done with the label section
+            else:
+                node.clear()
+        elif event == u'end' and section_node is not None:
+            if node.getparent().getparent() is section_node:
+                yield node.get(u'Pos'), float(_WELL_VALUE_XPATH(node))
+            node.clear()
+        ## FOR node ENDS
+
+
+def _parse_one_xml(filename, label):
+    """Reads growth measurements of a single Tecan Infinity XML output file.
+
+    Parameters
+    ----------
+    filename : str
+        path to the XML file.
+    label : str
+        measurment name used as ``Name`` in the measurement sections in the file.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Data frame with the ``Well``, `label`, ``Row``, ``Col``, ``Time`` (:py:class:`datetime.datetime`) and ``Filename`` columns,
+        or ``None`` if the file has no section named `label`.
+    """
+    # Stream the wells of the label section, clearing nodes once read.
+    section = {}
+    with open(filename, 'rb') as f:
+        data = np.fromiter(_iter_xml_wells(f, label, section), dtype=[(u'Well', '<U3'), (u'Value', np.float64)])
+    if u'Time_Start' not in section:
+        return None
+
+    # Get the time of measurement
+    time_start = section[u'Time_Start']
+
+    # Add to data frame
+    df = pd.DataFrame({u'Well': data[u'Well'], label: data[u'Value']})
+    df[u'Row'], df[u'Col'] = _parse_wells(df[u'Well'])
+    try:
+        df[u'Time'] = datetime.datetime.fromisoformat(time_start)
+    except ValueError: # e.g. trailing Z before Python 3.11
+        df[u'Time'] = dateutil.parser.parse(time_start)
+    df[u'Filename'] = os.path.split(filename)[-1]
+    return df
+
+
+@_cached
+def read_tecan_xml(filename, label=u'OD', max_time=None, plate=None, backend=u'pandas'):
     """Reads growth measurements from a Tecan Infinity XML output files.
 
     Parameters
@@ -320,6 +649,11 @@ def read_tecan_xml(filename, label=u'OD', max_time=None, plate=None):
         maximal time in hours, defaults to infinity
     plate : pandas.DataFrame, optional
         data frame representing a plate, usually generated by reading a CSV file generated by `Plato <http://plato.yoavram.com/>`_.
+    backend : str, optional
+        library used to concatenate the per-file data frames: ``pandas`` (default) or ``modin``, which concatenates in parallel when reading many files.
+    cache : bool, optional
+        if ``True``, the parsed data frame is stored in :py:data:`CACHE_DIR` and reused as long as the file is not modified;
+        defaults to ``True`` if the ``CURVEBALL_CACHE`` environment variable is set.
 
     Returns
     -------
@@ -351,57 +685,77 @@ def read_tecan_xml(filename, label=u'OD', max_time=None, plate=None):
     -----
     This function was adapted from `choderalab/assaytools <https://github.com/choderalab/assaytools/blob/908471e7976e207df3f9b0e31b2a89f84da40607/AssayTools/platereader.py>`_ (licensed under LGPL).
     """
-    from lxml import etree
-    dataframes = []
-    for filename in glob(filename):
-        # Parse XML file into nodes.
-        root_node = etree.parse(filename)
-
-        # Build a dict of section nodes.
-        section_nodes = { section_node.get(u'Name') : section_node for section_node in root_node.xpath(u"/*/Section") }
-
-        # Process all sections.
-        if label not in section_nodes:
-            return pd.DataFrame()
-
-        section_node = section_nodes[label]
-        
-        # Get the time of measurement
-        time_start = section_node.attrib[u'Time_Start']
-
-        # Get a list of all well nodes
-        well_nodes = section_node.xpath(u"*/Well")
-        
-        # Process all wells into data.
-        well_data = []
-        for well_node in well_nodes:
-            well = well_node.get(u'Pos')
-            value = float(well_node.xpath(u"string()"))
-            well_data.append({u'Well': well, label: value})
-
-        # Add to data frame
-        df = pd.DataFrame(well_data)
-        df[u'Row'] = [x[0] for x in df.Well]
-        df[u'Col'] = [int(x[1:]) for x in df.Well]
-        df[u'Time'] = dateutil.parser.parse(time_start)
-        df[u'Filename'] = os.path.split(filename)[-1]
-        dataframes.append(df)
-    df = pd.concat(dataframes)
+    files = glob(filename)
+    with ThreadPoolExecutor() as executor:
+        dataframes = list(executor.map(lambda fn: _parse_one_xml(fn, label), files))
+    if any(df is None for df in dataframes):
+        return pd.DataFrame()
+    df = _concat(dataframes, backend)
     min_time = df.Time.min()
-    df.Time = [(t - min_time).total_seconds() / 3600.0 for t in df.Time]
+    df[u'Time'] = (df[u'Time'] - min_time).dt.total_seconds() / 3600.0
     if plate is None:
-        df[u'Strain'] = u'0'
-        df[u'Color'] = u'#000000'
+        _set_default_strain(df)
     else:
-        df = pd.merge(df, plate, on=(u'Row', u'Col'))
+        df = _merge_plate(df, plate)
     if max_time is not None:
         df = df[df.Time <= max_time]
-    df.sort_values([u'Row', u'Col', u'Time'], inplace=True)
+    df = df.sort_values([u'Row', u'Col', u'Time'], kind='stable', ignore_index=True)
     _fix_dtypes(df)
     return df
 
 
-def read_sunrise_xlsx(filename, label=u'OD', max_time=None, plate=None):
+def _parse_one_sunrise(filename, label):
+    """Reads growth measurements of a single Tecan Sunrise Excel output file.
+
+    Parameters
+    ----------
+    filename : str
+        path to the XLSX file.
+    label : str
+        measurment name to use for the data in the file.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Data frame with the ``Row``, ``Col``, `label`, ``Time`` (:py:class:`datetime.datetime`), ``Well`` and ``Filename`` columns.
+    """
+    import openpyxl
+    wb = openpyxl.load_workbook(filename, read_only=True, data_only=True)
+    parse_data = False # start with metadata
+    index = []
+    data = []
+
+    for sh in wb.worksheets:
+        for row in sh.iter_rows(values_only=True):
+            if row[0] == u'Date:':
+                date = next(x for x in row[1:] if isinstance(x, datetime.datetime))
+            elif row[0] == u'Time:':
+                time = next(x for x in row[1:] if isinstance(x, datetime.time))
+            elif row[0] == u'<>':
+                columns = [int(x) for x in row[1:]]
+                parse_data = True
+            elif not row[0] and parse_data:
+                break
+            elif parse_data:
+                index.append(row[0])
+                data.append(row[1:])
+        if parse_data:
+            break
+    wb.close()
+
+    dateandtime = datetime.datetime.combine(date.date(), time)
+    
+    df = pd.DataFrame(np.array(data, dtype=np.float64), columns=columns, index=index)
+    df[u'Row'] = index
+    df = pd.melt(df, id_vars=u'Row', var_name=u'Col', value_name=label)
+    df[u'Time'] = dateandtime
+    df[u'Well'] = df[u'Row'] + df[u'Col'].astype(str)
+    df[u'Filename'] = os.path.split(filename)[-1]
+    return df
+
+
+@_cached
+def read_sunrise_xlsx(filename, label=u'OD', max_time=None, plate=None, backend=u'pandas'):
     """Reads growth measurements from a Tecan Sunrise Excel output file.
 
     Parameters
@@ -414,6 +768,11 @@ def read_sunrise_xlsx(filename, label=u'OD', max_time=None, plate=None):
         maximal time in hours, defaults to infinity
     plate : pandas.DataFrame, optional
         data frame representing a plate, usually generated by reading a CSV file generated by `Plato <http://plato.yoavram.com/>`_.
+    backend : str, optional
+        library used to concatenate the per-file data frames: ``pandas`` (default) or ``modin``, which concatenates in parallel when reading many files.
+    cache : bool, optional
+        if ``True``, the parsed data frame is stored in :py:data:`CACHE_DIR` and reused as long as the file is not modified;
+        defaults to ``True`` if the ``CURVEBALL_CACHE`` environment variable is set.
 
     Returns
     -------
@@ -429,114 +788,80 @@ def read_sunrise_xlsx(filename, label=u'OD', max_time=None, plate=None):
         - ``Strain`` (:py:class:`str`): if a `plate` was given, this is the strain name corresponding to the well from the plate.
         - ``Color`` (:py:class:`str`, hex format): if a `plate` was given, this is the strain color corresponding to the well from the plate.
     """
-    import xlrd
-    dataframes = []
     files = glob(filename)
     if not files:
         return pd.DataFrame()
-    for filename in files:
-        wb = xlrd.open_workbook(filename)
-        for sh in wb.sheets():
-            if sh.nrows > 0:
-                break
-        parse_data = False # start with metadata
-        index = []
-        data = []
-
-        for i in range(sh.nrows):
-            row = sh.row_values(i)
-            if row[0] == u'Date:':
-                date = next(filter(lambda x: isinstance(x, float), row[1:]))
-                date = xlrd.xldate_as_tuple(date, 0)        
-            elif row[0] == u'Time:':
-                time = next(filter(lambda x: isinstance(x, float), row[1:]))
-                time = xlrd.xldate_as_tuple(time, 0)
-            elif row[0] == u'<>':
-                columns = list(map(int, row[1:]))
-                parse_data = True
-            elif len(row[0]) == 0 and parse_data:
-                break
-            elif parse_data:
-                index.append(row[0])
-                data.append(list(map(float, row[1:])))
-                
-        dateandtime = date[:3] + time[-3:]
-        dateandtime = datetime.datetime(*dateandtime)
-        
-        df = pd.DataFrame(data, columns=columns, index=index)
-        df[u'Row'] = index
-        df = pd.melt(df, id_vars=u'Row', var_name=u'Col', value_name=label)
-        df[u'Time'] = dateandtime
-        df[u'Well'] = [x[0] + str(x[1]) for x in zip(df.Row, df.Col)]
-        df[u'Filename'] = os.path.split(filename)[-1]
-        dataframes.append(df)
-    df = pd.concat(dataframes)
+    with ThreadPoolExecutor() as executor:
+        dataframes = list(executor.map(lambda fn: _parse_one_sunrise(fn, label), files))
+    df = _concat(dataframes, backend)
     min_time = df.Time.min()
-    df.Time = [(t - min_time).total_seconds() / 3600.0 for t in df.Time]
+    df[u'Time'] = (df[u'Time'] - min_time).dt.total_seconds() / 3600.0
     if plate is None:
-        df[u'Strain'] = u'0'
-        df[u'Color'] = u'#000000'
+        _set_default_strain(df)
     else:
-        df = pd.merge(df, plate, on=(u'Row', u'Col'))
+        df = _merge_plate(df, plate)
     if max_time is not None:
         df = df[df.Time <= max_time]
-    df.sort_values([u'Row', u'Col', u'Time'], inplace=True)
+    df = df.sort_values([u'Row', u'Col', u'Time'], kind='stable', ignore_index=True)
     _fix_dtypes(df)
     return df
 
 
+@_cached
 def read_biotek_xlsx(filename, max_time=None, plate=None, PRINT=False):
-    import xlrd
-    wb = xlrd.open_workbook(filename)
-    for sh_i in range(wb.nsheets):
-        sh = wb.sheet_by_index(sh_i)
-        if sh.nrows > 0:
-            break
-    else: # all sheets are empty
-        warnings.warn('All sheets are empty in {}'.format(filename))
-        return pd.DataFrame()
+    import openpyxl
+    from openpyxl.utils.datetime import to_excel
+    wb = openpyxl.load_workbook(filename, read_only=True, data_only=True)
+    try:
+        for sh_i, sh in enumerate(wb.worksheets):
+            rows = [row for row in sh.iter_rows(values_only=True) if len(row) > 1]
+            if any(x is not None for row in rows for x in row):
+                break
+        else: # all sheets are empty
+            warnings.warn('All sheets are empty in {}'.format(filename))
+            return pd.DataFrame()
+    finally:
+        wb.close()
 
     if PRINT:
-        print("Reading worksheet {0} with {2} lines from workbook {1}".format(sh_i, filename, sh.nrows))
+        print("Reading worksheet {0} with {2} lines from workbook {1}".format(sh_i, filename, len(rows)))
 
     in_data = False
     data = []
     dfs = []
-    i = 0
-    while i < sh.nrows:
-        row = sh.row_values(i)
+    for row in rows:
         if not in_data and row[1] == 'Time':
             columns = row[1:]
             in_data = True
-        elif in_data and row[1] != '':
-            row[1] *= 24 # days -> hours
-            data.append(row[1:])
-        elif in_data and row[1] == '':
+        elif in_data and row[1] is not None:
+            # times are read as datetime.time, or datetime.timedelta from 24 hours
+            t = to_excel(row[1]) if isinstance(row[1], (datetime.time, datetime.timedelta)) else row[1]
+            data.append((t * 24,) + row[2:]) # days -> hours
+        elif in_data and row[1] is None:
             in_data = False
             df = pd.DataFrame(data, columns=columns)
+            # openpyxl reads whole numbers as int
+            df = df.astype({col: np.float64 for col, dtype in df.dtypes.items() if pd.api.types.is_integer_dtype(dtype)})
+            if max_time is not None:
+                df = df[df.Time <= max_time]
             df = pd.melt(df, [u'Time', u'T° 600'], var_name=u'Well', value_name=u'OD')
             dfs.append(df)
-        i += 1
     df = pd.concat(dfs )
 
-    df[u'Row'] = [x[0] for x in df.Well]
-    df[u'Col'] = [int(x[1:]) for x in df.Well]
+    df[u'Row'], df[u'Col'] = _parse_wells(df[u'Well'])
 
     min_time = df.Time.min()
     if PRINT:
         print("Starting time", min_time)
-    if max_time is not None:
-        df = df[df.Time <= max_time]
-    df.sort_values([u'Row', u'Col', u'Time'], inplace=True)
+    df = df.sort_values([u'Row', u'Col', u'Time'], kind='stable', ignore_index=True)
 
     if df.shape[0] == 0: # no dataframes
         return pd.DataFrame()
 
     if plate is None:
-        df[u'Strain'] = u'0'
-        df[u'Color'] = u'#000000'
+        _set_default_strain(df)
     else:
-        df = pd.merge(df, plate, on=(u'Row', u'Col'))
+        df = _merge_plate(df, plate)
     if PRINT: print("Read {0} records from workbook".format(df.shape[0]))
     _fix_dtypes(df)
     return df
@@ -95,6 +95,36 @@ def ridge_regularization(lam, **center):
     return _ridge_regularization
 
 
+def _loglik_grid(df, f, penalty, params, xname, xrange, yname, yrange):
+    """Computes the log-likelihood for every combination of values of two model parameters, see :py:func:`loglik_r_nu`.
+
+    With the default model function and no penalty, all the parameter sets are evaluated at once 
+    using :py:func:`curveball.baranyi_roberts_model.baranyi_roberts_batch`; 
+    otherwise, :py:func:`loglik` is called for each parameter set.
+    """
+    params = dict(params) if params else dict()
+    t = df.Time.unique()
+    grouped = df.groupby('Time').OD
+    y = grouped.mean().values
+    y_sig = grouped.std().values
+
+    if f is curveball.baranyi_roberts_model.baranyi_roberts_function and penalty is None:
+        X, Y = np.meshgrid(xrange, yrange, indexing='ij')
+        params[xname] = X.ravel()
+        params[yname] = Y.ravel()
+        yhat = curveball.baranyi_roberts_model.baranyi_roberts_batch(t, **params)
+        output = -0.5 * np.sum(np.log(2 * np.pi * y_sig ** 2) + (y - yhat) ** 2 / y_sig ** 2, axis=1)
+        return output.reshape(X.shape)
+
+    output = np.empty((len(xrange), len(yrange)))
+    for i, x in enumerate(xrange):
+        params[xname] = x
+        for j, y_ in enumerate(yrange):
+            params[yname] = y_
+            output[i,j] = loglik(t, y, y_sig, f, penalty, **params)
+    return output
+
+
 def loglik_r_nu(r_range, nu_range, df, f=curveball.baranyi_roberts_model.baranyi_roberts_function, 
                 penalty=None, **params):
     r"""Estimates the log-likelihood surface for :math:`r` and :math:`\nu` given data and a model function.
@@ -123,20 +153,7 @@ def loglik_r_nu(r_range, nu_range, df, f=curveball.baranyi_roberts_model.baranyi
     loglik
     loglik_r_q0
     """
-    if not params:
-        params = dict()
-    t = df.Time.unique()
-    y = df.groupby('Time').OD.mean().as_matrix()
-    y_sig = df.groupby('Time').OD.std().as_matrix()
-    
-    output = np.empty((len(r_range), len(nu_range)))
-    for i, r in enumerate(r_range):
-        params['r'] = r
-        for j, nu in enumerate(nu_range):
-            params['nu'] = nu
-            output[i,j] = loglik(t, y, y_sig, f, penalty, **params)
-    
-    return output
+    return _loglik_grid(df, f, penalty, params, 'r', r_range, 'nu', nu_range)
 
 
 def loglik_r_q0(r_range, q0_range, df, f=curveball.baranyi_roberts_model.baranyi_roberts_function, 
@@ -167,20 +184,7 @@ def loglik_r_q0(r_range, q0_range, df, f=curveball.baranyi_roberts_model.baranyi
     loglik
     loglik_r_nu
     """
-    if not params:
-        params = dict()
-    t = df.Time.unique()
-    y = df.groupby('Time').OD.mean().as_matrix()
-    y_sig = df.groupby('Time').OD.std().as_matrix()
-    
-    output = np.empty((len(r_range), len(q0_range)))
-    for i, r in enumerate(r_range):
-        params['r'] = r
-        for j, q0 in enumerate(q0_range):
-            params['q0'] = q0
-            output[i,j] = loglik(t, y, y_sig, f, penalty, **params)
-    
-    return output
+    return _loglik_grid(df, f, penalty, params, 'r', r_range, 'q0', q0_range)
 
 
 def plot_loglik(Ls, xrange, yrange, xlabel=None, ylabel=None, columns=4, fig_title=None, normalize=True,
@@ -12,30 +12,57 @@ from __future__ import division
 from builtins import str
 from builtins import range
 import sys
+import math
 import numbers
 from warnings import warn
 import numpy as np
-import matplotlib.pyplot as plt
 import collections
-try:
-	from scipy.stats.distributions import chi2
-	chisqprob = chi2.sf
-except ImportError:
-	from scipy.stats import chisqprob
+from scipy.stats import chi2
 from scipy.stats import linregress
 from scipy.misc import derivative
 import pandas as pd
 import copy
 import inspect
+import functools
+from concurrent.futures import ProcessPoolExecutor
 import lmfit
 import sympy
-import seaborn as sns
-sns.set_style("ticks")
+try:
+    import numba
+except ImportError:
+    numba = None
 import curveball
 import curveball.baranyi_roberts_model
 from curveball.utils import smooth
 
 
+# model instances shared across fit_model calls, see _get_model
+_MODEL_INSTANCES = {}
+# sympy Jacobians shared across make_Dfun calls, see _sympy_jacobian
+_JACOBIANS = {}
+# set by _plotting when the seaborn style is first set
+_STYLE_SET = False
+
+
+def _plotting():
+    """Imports the plotting libraries on first use, as they are slow to import and only needed when plotting.
+
+    Returns
+    -------
+    plt : module
+        :py:mod:`matplotlib.pyplot`
+    sns : module
+        :py:mod:`seaborn`, with the ``ticks`` style set on the first call.
+    """
+    global _STYLE_SET
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    if not _STYLE_SET:
+        sns.set_style("ticks")
+        _STYLE_SET = True
+    return plt, sns
+
+
 def is_model(cls):
     """Returns :const:`True` if the input is a subclass of :py:class:`lmfit.model.Model`.
 
@@ -72,6 +99,27 @@ def get_models(module):
     return [m[1] for m in inspect.getmembers(module, curveball.models.is_model)]
 
 
+def _get_model(model_class):
+    """Returns an instance of `model_class`, created on first use and reused afterwards.
+
+    Model instances are not changed by fitting, so they can be shared by all the fits of a model class,
+    saving the introspection of the model function every time a model is fitted.
+
+    Parameters
+    ----------
+    model_class : class
+        a subclass of :py:class:`lmfit.model.Model`
+
+    Returns
+    -------
+    lmfit.model.Model
+    """
+    model = _MODEL_INSTANCES.get(model_class)
+    if model is None:
+        model = _MODEL_INSTANCES[model_class] = model_class()
+    return model
+
+
 def bootstrap_params(df, model_result, nsamples, unit='Well', fit_kws=None):
     """Sample model parameters by fitting the model to resampled data.
 
@@ -137,10 +185,12 @@ def bootstrap_params(df, model_result, nsamples, unit='Well', fit_kws=None):
     return pd.DataFrame(param_samples)
 
 
-def sample_params(model_fit, nsamples, params=None, covar=None):
+def sample_params(model_fit, nsamples, params=None, covar=None, max_tries=100):
     """Random sample of parameter values from a truncated multivariate normal distribution defined by the 
     covariance matrix of the a model fitting result.
 
+    Samples outside the parameter bounds are drawn again, up to `max_tries` times.
+
     Parameters
     ----------
     model_fit : lmfit.model.ModelResult
@@ -151,6 +201,9 @@ def sample_params(model_fit, nsamples, params=None, covar=None):
         a dictionary of model parameter values; if given, overrides values from `model_fit`
     covar : numpy.ndarray, optional
         an array containing the parameters covariance matrix; if given, overrides values from `model_fit`
+    max_tries : int, optional
+        maximum number of times to draw samples that are outside the parameter bounds; 
+        if some samples are still outside the bounds they are omitted with a warning.
 
     Returns
     -------
@@ -161,6 +214,20 @@ def sample_params(model_fit, nsamples, params=None, covar=None):
     --------
     bootstrap_params
     """
+    samples, names = _sample_params_array(model_fit, nsamples, params=params, covar=covar, max_tries=max_tries)
+    return pd.DataFrame(samples, columns=names)
+
+
+def _sample_params_array(model_fit, nsamples, params=None, covar=None, max_tries=100):
+    """Random sample of parameter values as an array, see :py:func:`sample_params`.
+
+    Returns
+    -------
+    samples : numpy.ndarray
+        array of samples; each row is a sample, each column is a parameter, with the fixed parameters last.
+    names : list
+        the parameter names of the columns of `samples`.
+    """
     if params is None:
         params = model_fit.params
     else:
@@ -178,19 +245,52 @@ def sample_params(model_fit, nsamples, params=None, covar=None):
     if w != h:
         warn("Covariance matrix is not square: \n{}".format(covar))
     names = [p.name for p in params.values() if p.vary]
-    means = [p.value for p in params.values() if p.vary]
-        
-    param_samples = np.random.multivariate_normal(means, covar, nsamples)
-    param_samples = pd.DataFrame(param_samples, columns=names)
-    idx = np.zeros(nsamples) == 0
-    for p in params.values():
-        if not p.vary:
-            param_samples[p.name] = p.value
-        idx = idx & (param_samples[p.name] >= p.min) & (param_samples[p.name] <= p.max)
-    if param_samples.shape[0] < nsamples:
-        warn("Warning: truncated {0} parameter samples; please report at {1}, including the data and use case.".format(nsamples - param_samples.shape[0], "https://github.com/yoavram/curveball/issues"))
-    param_samples = param_samples[idx]
-    return param_samples
+    means = np.array([p.value for p in params.values() if p.vary])
+    lower = np.array([params[name].min for name in names])
+    upper = np.array([params[name].max for name in names])
+
+    # samples are means + z L^T for standard normal z, where L L^T = covar
+    try:
+        L = np.linalg.cholesky(covar)
+    except np.linalg.LinAlgError:
+        # not positive definite, factor as numpy.random.multivariate_normal does
+        u, s, vh = np.linalg.svd(covar)
+        L = (np.sqrt(s)[:, np.newaxis] * vh).T
+    samples = np.empty((nsamples, len(names)))
+    redraw = np.arange(nsamples)
+    for _ in range(max_tries):
+        ## FOR try
+        drawn = means + np.random.standard_normal((len(redraw), len(names))).dot(L.T)
+        samples[redraw] = drawn
+        inside = ((drawn >= lower) & (drawn <= upper)).all(axis=1)
+        redraw = redraw[~inside]
+        if len(redraw) == 0:
+            break
+        ## FOR try ENDS
+    if len(redraw) > 0:
+        warn("Warning: truncated {0} parameter samples; please report at {1}, including the data and use case.".format(len(redraw), "https://github.com/yoavram/curveball/issues"))
+        samples = np.delete(samples, redraw, axis=0)
+    fixed = [p for p in params.values() if not p.vary]
+    if fixed:
+        samples = np.hstack((samples, np.tile([p.value for p in fixed], (samples.shape[0], 1))))
+        names += [p.name for p in fixed]
+    return samples, names
+
+
+def _params_from_samples(model_fit, param_samples):
+    """Yields a copy of the parameters of `model_fit` for each parameter sample, with the sampled values of the varying parameters.
+
+    The sampled values are taken from the data frame once, rather than row by row.
+    """
+    names = [name for name, p in model_fit.params.items() if p.vary]
+    values = param_samples[names].values
+    ## FOR sample
+    for row in values:
+        params = model_fit.params.copy()
+        for name, value in zip(names, row):
+            params[name].set(value=value)
+        yield params
+    ## FOR sample ENDS
     
 
 
@@ -263,6 +363,8 @@ def lrtest(m0, m1, alfa=0.05):
     :py:attr:`lmfit.model.ModelResult.chisqr` is the sum of the square of the residuals of the fit. 
     :py:attr:`lmfit.model.ModelResult.ndata` is the number of data points. 
     :py:attr:`lmfit.model.ModelResult.nvarys` is the number of varying parameters.
+    If `m1` fits no better than `m0` (:math:`D \le 0`) or has the same number of varying parameters, 
+    the test is skipped and `m0` is preferred with a p-value of 1.
 
     Parameters
     ----------
@@ -296,11 +398,13 @@ def lrtest(m0, m1, alfa=0.05):
     k1 = m1.nvarys
     chisqr1 = m1.chisqr
     assert chisqr1 > 0, chisqr1
-    D = -n0 * (np.log(m1.chisqr) - np.log(m0.chisqr))
-    assert D > 0, D
     ddf = k1 - k0
-    assert ddf > 0, ddf
-    pval = chisqprob(D, ddf)
+    assert ddf >= 0, ddf
+    D = n0 * np.log(chisqr0 / chisqr1)
+    if D <= 0 or ddf == 0:
+        # m1 fits no better than m0, or has no extra parameters
+        return False, 1.0, D, ddf
+    pval = chi2.sf(D, ddf)
     prefer_m1 = pval < alfa
     return prefer_m1, pval, D, ddf
 
@@ -309,7 +413,9 @@ def find_max_growth(model_fit, params=None, after_lag=True):
     r"""Estimates the maximum population and specific growth rates from the model fit.
 
     The function calculates the maximum population growth rate :math:`a=\max{\frac{dy}{dt}}` 
-    as the derivative of the model curve and calculates its maximum. 
+    as the derivative of the model curve and calculates its maximum; 
+    the derivative is analytic for models with an `eval_derivative` method and numeric otherwise. 
+    Models with an `analytic_max_growth` method, such as the logistic and Richards models, give the maxima in closed form.
     It also calculates the maximum of the per capita growth rate :math:`\mu = \max{\frac{dy}{y \cdot dt}}`.
     The latter is more useful as a metric to compare different strains or treatments 
     as it does not depend on the population size/density.    
@@ -373,11 +479,16 @@ def find_max_growth(model_fit, params=None, after_lag=True):
     t0 = find_lag(model_fit) if after_lag else 0
     t0 = max(t0, 0)
     t1 = model_fit.userkws['t'].max()
+    if hasattr(model_fit.model, 'analytic_max_growth'):
+        max_growth = model_fit.model.analytic_max_growth(params, t0, t1)
+        if max_growth is not None:
+            return max_growth
     t = np.linspace(t0, t1)     
-    def f(t): 
-        return model_fit.model.eval(t=t, params=params)
-    y = f(t)
-    dfdt = derivative(f, t)
+    y = model_fit.model.eval(t=t, params=params)
+    if hasattr(model_fit.model, 'eval_derivative'):
+        dfdt = model_fit.model.eval_derivative(params, t)
+    else:
+        dfdt = np.gradient(y, t)
 
     a = dfdt.max()
     i = dfdt.argmax()
@@ -428,12 +539,7 @@ def find_max_growth_ci(model_fit, param_samples, after_lag=True, ci=0.95):
     nsamples = param_samples.shape[0]
     aa = np.zeros(nsamples)
     mumu = np.zeros(nsamples)        
-    for i in range(param_samples.shape[0]):
-        sample = param_samples.iloc[i,:]
-        params = model_fit.params.copy()
-        for k,v in params.items():
-            if v.vary:
-                params[k].set(value=sample[k])
+    for i, params in enumerate(_params_from_samples(model_fit, param_samples)):
         _, _, a, _, _, mu = find_max_growth(model_fit, params=params, after_lag=after_lag)
         aa[i] = a
         mumu[i] = mu
@@ -503,6 +609,7 @@ def find_min_doubling_time(model_fit, params=None, PLOT=False):
     min_dbl = doubling_times.min()
 
     if PLOT:
+        plt, sns = _plotting()
         fig, ax = plt.subplots(1, 1)
         ax.plot(t[:imax], doubling_times, '-')
         ax.axhline(min_dbl, ls='--', color='k')
@@ -542,12 +649,7 @@ def find_min_doubling_time_ci(model_fit, param_samples, ci=0.95):
         raise ValueError("ci must be between 0 and 1")
     nsamples = param_samples.shape[0]
     dbls = np.zeros(nsamples)    
-    for i in range(param_samples.shape[0]):
-        sample = param_samples.iloc[i,:]
-        params = model_fit.params.copy()
-        for k, v in params.items():
-            if v.vary:
-                v.value = sample[k]
+    for i, params in enumerate(_params_from_samples(model_fit, param_samples)):
         dbls[i] = find_min_doubling_time(model_fit, params=params)
 
     margin = (1.0 - ci) * 50.0
@@ -595,12 +697,14 @@ def find_K_ci(param_samples, ci=0.95):
     return low, high
 
 
-def find_lag(model_fit, params=None):
+def find_lag(model_fit, params=None, t=None):
     """Estimates the lag duration from the model fit.
 
     The function calculates the tangent line to the model curve at the point of maximum derivative (the inflection point). 
     The time when this line intersects with :math:`N_0` (the initial population size) 
     is labeled :math:`\lambda` and is called the lag duration time [fig2.2]_.
+    For models without a lag phase (Richards and logistic), the inflection point has a closed form; 
+    otherwise it is found numerically.
 
     Parameters
     ----------
@@ -608,6 +712,10 @@ def find_lag(model_fit, params=None):
         the result of a model fitting procedure
     params : lmfit.parameter.Parameters, optional
         if provided, these parameters will override `model_fit`'s parameters
+    t : numpy.ndarray, optional
+        sorted time points at which to look for the maximum derivative; 
+        defaults to 50 points spanning the time of `model_fit`. 
+        Pass the same array to estimate the lag for many parameters, as :py:func:`find_lag_ci` does.
 
     Returns
     -------
@@ -629,12 +737,24 @@ def find_lag(model_fit, params=None):
     y0 = params['y0'].value
     K  = params['K'].value
 
-    t = model_fit.userkws['t']
-    t = np.linspace(t.min(), t.max())
-    def f(t): 
-        return model_fit.model.eval(t=t, params=params)
-    y = f(t)    
-    dfdt = derivative(f, t)
+    if t is None:
+        t = model_fit.userkws['t']
+        t = np.linspace(t.min(), t.max())
+    q0 = params['q0'].value if 'q0' in params else np.inf
+    if 'r' in params and np.isposinf(q0) and np.isfinite(K) and K > y0:
+        # Richards/logistic curve: the inflection point is at y1 = K (1+nu)^(-1/nu)
+        r = params['r'].value
+        nu = params['nu'].value if 'nu' in params else 1.0
+        t1 = np.log(((K / y0)**nu - 1.0) / nu) / (r * nu)
+        if t.min() <= t1 <= t.max():
+            a = r * K * nu * (1.0 + nu)**(-1.0 - 1.0 / nu)
+            y1 = K * (1.0 + nu)**(-1.0 / nu)
+            return t1 + (y0 - y1) / a
+    y = model_fit.model.eval(t=t, params=params)
+    if hasattr(model_fit.model, 'eval_derivative'):
+        dfdt = model_fit.model.eval_derivative(params, t)
+    else:
+        dfdt = np.gradient(y, t)
     idx = y > K / np.e
     if idx.sum() == 0:
         warn("All values are below K/e")
@@ -652,6 +772,36 @@ def find_lag(model_fit, params=None):
     return lam
 
 
+def _baranyi_roberts_samples(model_fit, param_samples):
+    """Arranges parameter samples of a Baranyi-Roberts family model as rows of y0, K, r, nu, q0 and v.
+
+    Parameters that are not varied in `model_fit` take their fitted value,
+    and parameters that are not in the model take their value in the nested model (:math:`\nu=1`, :math:`q_0=v=\infty`).
+
+    Parameters
+    ----------
+    model_fit : lmfit.model.ModelResult
+        the result of fitting a :py:class:`curveball.baranyi_roberts_model.BaranyiRoberts` model or one of its nested models
+    param_samples : pandas.DataFrame
+        parameter samples, generated using :function:`sample_params` or :function:`bootstrap_params`
+
+    Returns
+    -------
+    numpy.ndarray
+        array of shape (number of samples, 6)
+    """
+    defaults = dict(nu=1.0, q0=np.inf, v=np.inf)
+    values = np.empty((param_samples.shape[0], 6))
+    for j, pname in enumerate(('y0', 'K', 'r', 'nu', 'q0', 'v')):
+        if pname not in model_fit.params:
+            values[:, j] = defaults[pname]
+        elif model_fit.params[pname].vary:
+            values[:, j] = param_samples[pname].values
+        else:
+            values[:, j] = model_fit.params[pname].value
+    return values
+
+
 def find_lag_ci(model_fit, param_samples, ci=0.95):
     """Estimates a confidence interval for the lag duration from the model fit.
 
@@ -682,13 +832,22 @@ def find_lag_ci(model_fit, param_samples, ci=0.95):
         raise ValueError("ci must be between 0 and 1")
     nsamples = param_samples.shape[0]
     lags = np.zeros(nsamples)    
-    for i in range(param_samples.shape[0]):
-        sample = param_samples.iloc[i,:]
-        params = model_fit.params.copy()
-        for k,v in params.items():
-            if v.vary:
-                params[k].set(value=sample[k])
-        lags[i] = find_lag(model_fit, params=params)
+    # the time points of find_lag, made once for all samples
+    t = model_fit.userkws['t']
+    t = np.linspace(t.min(), t.max())
+    if isinstance(model_fit.model, curveball.baranyi_roberts_model.BaranyiRoberts):
+        values = _baranyi_roberts_samples(model_fit, param_samples)
+        # repeated samples, for example of parameters at their bounds or from bootstrap_params, are calculated once
+        values, inverse = np.unique(values, axis=0, return_inverse=True)
+        if curveball.baranyi_roberts_model._find_lag_kernel is not None:
+            unique_lags = np.zeros(values.shape[0])
+            curveball.baranyi_roberts_model._find_lag_kernel(t, values, unique_lags)
+        else:
+            unique_lags = curveball.baranyi_roberts_model._find_lag_batch(t, values)
+        lags = unique_lags[inverse]
+    else:
+        for i, params in enumerate(_params_from_samples(model_fit, param_samples)):
+            lags[i] = find_lag(model_fit, params=params, t=t)
 
     margin = (1.0 - ci) * 50.0
     idx = np.isfinite(lags)
@@ -807,24 +966,128 @@ def has_nu(model_fits, alfa=0.05, PRINT=False):
     return prefer_m1
 
 
+def _sympy_jacobian(model, params):
+    """Returns the partial derivatives of the model function with respect to the varying parameters as a single numpy function.
+
+    Differentiating and lambdifying the sympy expression is slow, so the function is created on first use 
+    for each model class and set of varying parameters, and reused afterwards.
+    All partial derivatives are lambdified together so that their common subexpressions are evaluated once.
+    Fixed parameters are arguments of the function rather than substituted into the expression, 
+    so the function can be reused for any values of the fixed parameters.
+
+    Parameters
+    ----------
+    model : lmfit.model.Model
+        the model; must have a `get_sympy_expr` method.
+    params : lmfit.parameter.Parameters
+        the model parameters, possibly created by the model `guess` method.
+
+    Returns
+    -------
+    jacobian : callable
+        a function of the time and the parameters named in `arg_names` that returns a list of the partial derivatives, 
+        in the order of the varying parameters in `params`
+    arg_names : tuple of str
+        the names of the parameters to pass to `jacobian` after the time
+    """
+    key = (model.__class__, tuple(name for name, par in params.items() if par.vary))
+    if key not in _JACOBIANS:
+        all_params = params.copy()
+        for par in all_params.values():
+            par.vary = True
+        expr, t, args = model.get_sympy_expr(all_params)
+        partial_derivs = [expr.diff(x) for x in args if params[x.name].vary]
+        jacobian = sympy.lambdify(args=(t,) + args, expr=partial_derivs, modules="numpy", cse=True)
+        _JACOBIANS[key] = jacobian, tuple(x.name for x in args)
+    return _JACOBIANS[key]
+
+
 def make_Dfun(model, params):
-    expr, t, args = model.get_sympy_expr(params)
-    partial_derivs = [None]*len(args)
-    for i,x in enumerate(args):
-        dydx = expr.diff(x)
-        dydx = sympy.lambdify(args=(t,) + args, expr=dydx, modules="numpy")
-        partial_derivs[i] = dydx        
+    if hasattr(model, 'eval_jacobian'):
+        # analytic partial derivatives, no need for sympy
+        def Dfun(params, y, a, t):
+            jac = model.eval_jacobian(params, t)
+            res = np.array([jac[name] for name, par in params.items() if par.vary])
+            if a is not None:
+                res *= a # residuals are weighted
+            expected_shape = (len(res), len(t))
+            if res.shape != expected_shape:
+                raise TypeError("Dfun result shape for {0} is incorrect, expected {1} but it is {2}.".format(model.name, expected_shape, res.shape))
+            return res
+        return Dfun
+
+    jacobian, arg_names = _sympy_jacobian(model, params)
+    nvary = sum(par.vary for par in params.values())
     def Dfun(params, y, a, t):
-        values = [ par.value for par in params.values() if par.vary ]
-        res = np.array([dydx(t, *values) for dydx in partial_derivs])
-        expected_shape = (len(values), len(t))
+        values = [params[name].value for name in arg_names]
+        res = np.array(jacobian(t, *values))
+        expected_shape = (nvary, len(t))
         if res.shape != expected_shape:
             raise TypeError("Dfun result shape for {0} is incorrect, expected {1} but it is {2}.".format(model.name, expected_shape, res.shape))
         return res
     return Dfun
 
 
-def cooks_distance(df, model_fit, use_weights=True):
+def make_jac(model, params, t, weights=None):
+    """Make a Jacobian function for fitting a model with the `least_squares` method.
+
+    Unlike the `leastsq` method, which uses :py:func:`make_Dfun`, `least_squares` applies the parameter bounds natively
+    and calls the Jacobian with an array of the varying parameter values, so the time and weights are bound here.
+
+    Parameters
+    ----------
+    model : lmfit.model.Model
+        the model to fit; must have an `eval_jacobian` method.
+    params : lmfit.parameter.Parameters
+        the initial model parameters, possibly created by the model `guess` method.
+    t : numpy.ndarray
+        time, usually in hours
+    weights : numpy.ndarray, optional
+        the weights of the residuals used in the fit.
+
+    Returns
+    -------
+    callable
+        a function of the varying parameter values that returns the Jacobian of the residuals,
+        with one row per time point and one column per varying parameter.
+    """
+    params = copy.deepcopy(params)
+    names = [name for name, par in params.items() if par.vary]
+    def jac(x, *args, **kwargs):
+        for name, value in zip(names, x):
+            params[name].value = value
+        jac = model.eval_jacobian(params, t)
+        res = np.column_stack([jac[name] for name in names])
+        if weights is not None:
+            res *= np.asarray(weights)[:, np.newaxis] # residuals are weighted
+        return res
+    return jac
+
+
+def _cooks_refit(i, time, OD, well_codes, time_codes, model, params, method, fit_kws, use_weights):
+    """Refit a model to the growth curve data without one well and return the chi-square, see :py:func:`cooks_distance`.
+
+    The data is given as arrays, with the wells and time points encoded as integers, 
+    so that the well with code `i` is left out, and the weights calculated, without scanning and grouping a data frame.
+    The Jacobian functions named in `fit_kws` are made for the refit, as they cannot be sent to a worker process
+    and the least_squares Jacobian is bound to the time and weights.
+    """
+    idx = well_codes != i
+    time = time[idx]
+    OD = OD[idx]
+    if use_weights:
+        weights = _weights_from_deviations(_deviations(time_codes[idx], OD))
+    else:
+        weights = None
+    fit_kws = dict(fit_kws)
+    if 'Dfun' in fit_kws:
+        fit_kws['Dfun'] = make_Dfun(model, params)
+    if 'jac' in fit_kws:
+        fit_kws['jac'] = make_jac(model, params, time, weights)
+    return model.fit(data=OD, t=time, params=params, weights=weights, method=method, fit_kws=fit_kws).chisqr
+
+
+def cooks_distance(df, model_fit, use_weights=True, n_jobs=1):
     """Calculates Cook's distance of each well given a specific model fit. 
 
     Cook's distance is an estimate of the influence of a data curve when performing model fitting; 
@@ -839,6 +1102,9 @@ def cooks_distance(df, model_fit, use_weights=True):
         result of model fitting procedure
     use_weights : bool, optional
         should the function use standard deviation across replicates as weights for the fitting procedure, defaults to :const:`True`.
+    n_jobs : int, optional
+        number of worker processes used to refit the model without each well in parallel; 
+        defaults to 1, which refits in the calling process, and -1 uses all the processors.
 
     Returns
     -------
@@ -851,18 +1117,19 @@ def cooks_distance(df, model_fit, use_weights=True):
     """
     p = model_fit.nvarys
     MSE = model_fit.chisqr / model_fit.ndata
-    wells = df.Well.unique()
-    D = {}
-    
-    for well in wells:    
-        _df = df[df.Well != well]
-        time = _df.Time.as_matrix()
-        OD = _df.OD.as_matrix()
-        weights =  calc_weights(_df) if use_weights else None
-        model_fit_i = copy.deepcopy(model_fit)
-        model_fit_i.fit(data=OD, t=time, weights=weights)
-        D[well] = model_fit_i.chisqr / (p * MSE)
-    return D
+    well_codes, wells = pd.factorize(df.Well)
+    time_codes, _ = pd.factorize(df.Time)
+    # refit with the model directly rather than a deep copy of model_fit, starting from the fitted parameters;
+    # the Jacobian functions are made again by _cooks_refit
+    fit_kws = {key: None if key in ('Dfun', 'jac') else value for key, value in model_fit.kws.items()}
+    refit = functools.partial(_cooks_refit, time=df.Time.values, OD=df.OD.values, well_codes=well_codes, time_codes=time_codes, 
+        model=model_fit.model, params=model_fit.params, method=model_fit.method, fit_kws=fit_kws, use_weights=use_weights)
+    if n_jobs == 1:
+        chisqrs = [refit(i) for i in range(len(wells))]
+    else:
+        with ProcessPoolExecutor(max_workers=None if n_jobs < 0 else n_jobs) as executor:
+            chisqrs = list(executor.map(refit, range(len(wells))))
+    return {well: chisqr / (p * MSE) for well, chisqr in zip(wells, chisqrs)}
 
 
 def find_outliers(df, model_fit, deviations=2, use_weights=True, ax=None, PLOT=False):
@@ -897,20 +1164,20 @@ def find_outliers(df, model_fit, deviations=2, use_weights=True, ax=None, PLOT=F
         if the argument `PLOT` was :const:`True`, the generated axis.
     """
     D = cooks_distance(df, model_fit, use_weights=use_weights)
-    D = sorted(D.items()) # TODO SortedDict?
-    distances = [x[1] for x in D]        
-    dist_mean, dist_std = np.mean(distances), np.std(distances)
-    outliers = [well for well,dist in D if dist > dist_mean + deviations * dist_std]
+    wells = np.array(list(D.keys()))
+    distances = np.array(list(D.values()))
+    order = np.argsort(wells)
+    wells, distances = wells[order], distances[order]
+    dist_mean, dist_std = distances.mean(), distances.std()
+    outliers = wells[distances > dist_mean + deviations * dist_std].tolist()
     if PLOT:
+        plt, sns = _plotting()
         if ax is None:
             fig,ax = plt.subplots(1,1)
         else:
             fig = ax.get_figure()
-        wells = [x[0] for x in D]            
         ax.stem(distances, linefmt='k-', basefmt='')
-        ax.axhline(y=dist_mean, ls='-', color='k')
-        ax.axhline(y=dist_mean + deviations * dist_std, ls='--', color='k')
-        ax.axhline(y=dist_mean - deviations * dist_std, ls='--', color='k')
+        ax.hlines([dist_mean, dist_mean + deviations * dist_std, dist_mean - deviations * dist_std], -0.5, len(wells) - 0.5, colors='k', linestyles=['-', '--', '--'])
         ax.set_xticks(range(len(wells)))
         ax.set_xlim(-0.5, len(wells) - 0.5)
         ax.set_xticklabels(wells, rotation=90)
@@ -956,21 +1223,24 @@ def find_all_outliers(df, model_fit, deviations=2, max_outlier_fraction=0.1, use
     """
     outliers = []
     num_wells = len(df.Well.unique())
-    df = copy.deepcopy(df)
     if PLOT:
+        plt, sns = _plotting()
         fig = plt.figure()
         o, fig, ax = find_outliers(df, model_fit, deviations=deviations, use_weights=use_weights, ax=fig.add_subplot(), PLOT=PLOT)
     else:
         o = find_outliers(df, model_fit, deviations=deviations, use_weights=use_weights, PLOT=PLOT)
     outliers.append(o)
+    active = np.ones(df.shape[0], dtype=bool)
     while len(outliers[-1]) != 0 and len(sum(outliers, [])) <  max_outlier_fraction * num_wells:
-        df = df[~df.Well.isin(outliers[-1])]
-        assert df.shape[0] > 0, df.shape[0] 
-        model_fit = fit_model(df, use_weights=use_weights, PLOT=False, PRINT=False)[0]
+        active &= ~df.Well.isin(outliers[-1]).values
+        _df = df.loc[active]
+        assert _df.shape[0] > 0, _df.shape[0]
+        # start from the previous fit rather than the heuristic guesses, as only a few wells were removed
+        model_fit = fit_model(_df, param_guess=model_fit.best_values, use_weights=use_weights, PLOT=False, PRINT=False)[0]
         if PLOT:
-            o, fig, ax = find_outliers(df, model_fit, deviations=deviations, use_weights=use_weights, ax=fig.add_subplot(), PLOT=PLOT)            
+            o, fig, ax = find_outliers(_df, model_fit, deviations=deviations, use_weights=use_weights, ax=fig.add_subplot(), PLOT=PLOT)            
         else:
-            o = find_outliers(df, model_fit, deviations=deviations, use_weights=use_weights, PLOT=PLOT)
+            o = find_outliers(_df, model_fit, deviations=deviations, use_weights=use_weights, PLOT=PLOT)
         outliers.append(o)
     if PLOT:
         return outliers[:-1],fig,ax
@@ -999,7 +1269,87 @@ def calc_weights(df, PLOT=False):
     ax : matplotlib.axes.Axes
         if the argument `PLOT` was :const:`True`, the generated axis.
     """
-    deviations = df.groupby('Time').OD.transform(lambda x: np.repeat(x.std(), len(x))).as_matrix()
+    deviations = _deviations(pd.factorize(df.Time)[0], df.OD.values)
+    weights = _weights_from_deviations(deviations)
+    if PLOT:
+        plt, sns = _plotting()
+        fig, ax = plt.subplots(1, 1)
+        ax.plot(df.Time, weights, 'o')
+        ax.set_xlabel('Time')
+        ax.set_ylabel('Weight')
+        sns.despine()
+        return weights, fig, ax
+    return weights
+
+
+def _deviations(time_codes, OD):
+    """Calculate the standard deviation of the observations at the time point of each observation.
+
+    The time points are given as integer codes (for example, from :py:func:`pandas.factorize`), 
+    so that the deviations are calculated with :py:func:`numpy.bincount` rather than by grouping a data frame.
+    As with :py:meth:`pandas.Series.std`, the deviation of a single observation is NaN.
+    """
+    counts = np.bincount(time_codes)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        means = np.bincount(time_codes, weights=OD) / counts
+        deviations = np.sqrt(np.bincount(time_codes, weights=(OD - means[time_codes])**2) / (counts - 1))
+    return deviations[time_codes]
+
+
+def _weights_loop(deviations, out):
+    """Write the inverse of `deviations` to `out` in one pass, changing infinite weights to the maximum finite weight.
+
+    Returns
+    -------
+    int
+        the number of infinite weights, or -1 if there is a NaN in `deviations`, in which case `out` is incomplete.
+    """
+    max_weight = -np.inf
+    num_inf = 0
+    ## FOR deviation
+    for i in range(deviations.shape[0]):
+        if math.isnan(deviations[i]):
+            return -1
+        out[i] = 1.0 / deviations[i]
+        if math.isinf(out[i]):
+            num_inf += 1
+        elif out[i] > max_weight:
+            max_weight = out[i]
+    ## FOR deviation ENDS
+    if 0 < num_inf < deviations.shape[0]:
+        ## FOR weight
+        for i in range(deviations.shape[0]):
+            if math.isinf(out[i]):
+                out[i] = max_weight
+        ## FOR weight ENDS
+    return num_inf
+
+
+# nogil so that it can run in threads, for example of an outer parallel loop
+if numba is not None:
+    _weights_kernel = numba.njit('int64(float64[:], float64[:])', nogil=True, 
+        fastmath=curveball.baranyi_roberts_model._FASTMATH_FLAGS, cache=True, error_model='numpy')(_weights_loop)
+else:
+    _weights_kernel = None
+
+
+def _weights_from_deviations(deviations):
+    """Calculate weights from the standard deviations at the time point of each observation, see :py:func:`calc_weights`.
+    """
+    if _weights_kernel is not None:
+        deviations = np.ascontiguousarray(deviations, dtype=np.float64)
+        weights = np.empty_like(deviations)
+        num_inf = _weights_kernel(deviations, weights)
+        if num_inf < 0:
+            warn("NaN in deviations, can't use weights")
+            weights = None
+        elif num_inf == weights.shape[0]:
+            warn("All weights are infinite, proceeding without weights)")
+            weights = None
+        elif num_inf > 0:
+            warn("Found infinite weight, changing to maximum ({0} occurences)".format(num_inf))
+        return weights
+
     if np.isnan(deviations).any():
         warn("NaN in deviations, can't use weights")
         weights = None
@@ -1017,13 +1367,6 @@ def calc_weights(df, PLOT=False):
         elif idx.any():
             warn("Found infinite weight, changing to maximum ({0} occurences)".format(idx.sum()))
             weights[idx] = weights[~idx].max()
-    if PLOT:
-        fig, ax = plt.subplots(1, 1)
-        ax.plot(df.Time, weights, 'o')
-        ax.set_xlabel('Time')
-        ax.set_ylabel('Weight')
-        sns.despine()
-        return weights, fig, ax
     return weights
 
 
@@ -1098,8 +1441,89 @@ def fit_exponential_growth_phase(t, N, k=2):
     return slope, intercept
 
 
+def _fit_one(model_class, param_guess, t, y, weights, param_min, param_max, param_fix, use_Dfun, method, picklable=False):
+    """Fit a single model class to growth curve data, see :py:func:`fit_model`.
+
+    If `picklable` is :const:`True`, the Jacobian function is removed from the result 
+    so that it can be sent back from a worker process; it is not needed after the fit.
+    """
+    model = _get_model(model_class)
+    params = model.guess(data=y, t=t, param_guess=param_guess, param_min=param_min, param_max=param_max, param_fix=param_fix)
+    if use_Dfun and method == 'leastsq':
+        fit_kws = {'Dfun': make_Dfun(model, params), 'col_deriv': True}
+    elif method == 'least_squares':
+        # scale the parameters by the Jacobian column norms, which helps with the correlated r-nu and q0-v pairs
+        fit_kws = {'x_scale': 'jac'}
+        if use_Dfun:
+            fit_kws['jac'] = make_jac(model, params, t, weights)
+    else:
+        fit_kws = {}
+    model_result = model.fit(data=y, t=t, params=params, weights=weights, fit_kws=fit_kws, method=method)
+    if picklable:
+        model_result.jacfcn = None
+        for kws in (model_result.kws, getattr(model_result, 'call_kws', {})):
+            kws.pop('Dfun', None)
+            kws.pop('jac', None)
+    return model_result
+
+
+def plot_fits(results, top_k=None):
+    """Plot model fitting results side by side, each with the data, the fitted curve and the fitted parameters.
+
+    Parameters
+    ----------
+    results : list of lmfit.model.ModelResult
+        model fitting results of the same data, usually sorted by :py:func:`fit_model`.
+    top_k : int, optional
+        plot only the first `top_k` results; defaults to plotting all results.
+
+    Returns
+    -------
+    fig : matplotlib.figure.Figure
+        figure object.
+    ax : numpy.ndarray
+        array of :py:class:`matplotlib.axes.Axes` objects, one for each plotted result, with the same order as `results`.
+    """
+    if top_k is not None:
+        results = results[:top_k]
+    # all the results are fitted to the same data
+    time, OD = results[0].userkws['t'], results[0].data
+    ODerr = _deviations(pd.factorize(time)[0], OD)
+    plt, sns = _plotting()
+    od_min, od_max, t_max = OD.min(), OD.max(), time.max()
+    t_dense = np.linspace(time.min(), t_max, 200)
+    columns = min(3, len(results))
+    rows = int(np.ceil(len(results) / columns))
+    w = max(8, 4 * columns)
+    h = max(6, 3*rows)
+    fig, ax = plt.subplots(rows, columns, sharex=True, sharey=True, figsize=(w, h))
+    if not hasattr(ax, '__iter__'):
+        ax = np.array(ax, ndmin=2)
+    for i,fit in enumerate(results):
+        row = i // columns
+        col = i % columns
+        _ax = ax[row, col]
+        vals = fit.best_values
+        # the data points and error bars are rasterized, so that figures of large plates are cheap to draw and save
+        _ax.errorbar(time, OD, yerr=ODerr, fmt='.', alpha=0.3, rasterized=True)
+        _ax.plot(t_dense, fit.eval(t=t_dense), lw=4)
+        _ax.hlines([vals.get('y0', 0), vals.get('K', 0)], 0, 1.1 * t_max, colors='k', linestyles='--')
+        title = '%s %dp\nBIC: %.3f\ny0=%.2f, K=%.2f, r=%.2g\n' + r'$\nu$=%.2g, $q_0$=%.2g, v=%.2g'
+        title = title % (fit.model.name, fit.nvarys, fit.bic, vals.get('y0', np.nan), vals.get('K', np.nan), vals.get('r', np.nan), vals.get('nu', np.nan), vals.get('q0', np.nan), vals.get('v', np.nan))
+        _ax.set_title(title)
+        if col == 0:
+            _ax.set_ylabel('OD')
+        if row == rows - 1:
+            _ax.set_xlabel('Time')
+    _ax.set_xlim(0, 1.1 * t_max)
+    _ax.set_ylim(0.9 * od_min, 1.1 * od_max)
+    sns.despine()
+    fig.tight_layout()
+    return fig, ax
+
+
 def fit_model(df, param_guess=None, param_min=None, param_max=None, param_fix=None, 
-              models=None, use_weights=False, use_Dfun=False, method='leastsq', ax=None, PLOT=True, PRINT=True):
+              models=None, use_weights=False, use_Dfun=True, method='leastsq', n_jobs=1, ax=None, PLOT=True, PRINT=True):
     r"""Fit and select a growth model to growth curve data.
 
     This function fits several growth models to growth curve data (``OD`` as a function of ``Time``).
@@ -1119,16 +1543,22 @@ def fit_model(df, param_guess=None, param_min=None, param_max=None, param_fix=No
     use_weights : bool, optional
         should the function use the deviation across replicates as weights for the fitting procedure, defaults to :const:`False`.
     use_Dfun : bool, optional
-        should the function calculate the partial derivatives of the model functions to be used in the fitting procedure, defaults to :const:`False`.
+        should the function use the analytic partial derivatives of the model functions in the fitting procedure
+        rather than finite differences, defaults to :const:`True`; only used with the `leastsq` and `least_squares` methods.
     models : one or more model classes, optional
         model classes (not instances) to use for fitting; defaults to all model classes in `curveball.baranyi_roberts_model`.
     method : str, optional
-        the minimization method to use, defaults to `leastsq`, 
-        can be anything accepted by :py:func:`lmfit.minimizer.Minimizer.minimize` or :py:func:`lmfit.minimizer.Minimizer.scalar_minimize`.
+        the minimization method to use, defaults to `leastsq`; 
+        `least_squares` uses the trust region reflective algorithm, which applies the parameter bounds without transforming the parameters.
+        Can be anything accepted by :py:func:`lmfit.minimizer.Minimizer.minimize` or :py:func:`lmfit.minimizer.Minimizer.scalar_minimize`.
+    n_jobs : int, optional
+        number of worker processes used to fit the models in parallel; 
+        defaults to 1, which fits the models one after the other in the calling process, 
+        and -1 uses all the processors.
     ax : matplotlib.axes.Axes, optional
         an axes to plot into; if not provided, a new one is created.
     PLOT : bool, optional
-        if :const:`True`, the function will plot the all model fitting results.
+        if :const:`True`, the function will plot the all model fitting results with :py:func:`plot_fits`.
     PRINT : bool, optional
         if :const:`True`, the function will print the all model fitting results.
 
@@ -1170,23 +1600,38 @@ def fit_model(df, param_guess=None, param_min=None, param_max=None, param_fix=No
         param_fix = set()
 
     df = df.sort_values(by=['Time', 'OD'])
-    time = df.Time.as_matrix()
-    OD = df.OD.as_matrix()
+    time = df.Time.values
+    OD = df.OD.values
     weights =  calc_weights(df) if use_weights else None
     # TODO why should we use weights if we use the whole data set?
-    ODerr = df.groupby('Time').OD.transform(lambda x: np.repeat(x.std(), len(x))).as_matrix()
    
     if models is None:
         models = get_models(curveball.baranyi_roberts_model)
     elif is_model(models):
         models = [models]
-    results = [None] * len(models)
-    for i, model_class in enumerate(models):
-        model = model_class()
-        params = model.guess(data=OD, t=time, param_guess=param_guess, param_min=param_min, param_max=param_max, param_fix=param_fix)    
-        fit_kws = {'Dfun': make_Dfun(model, params), "col_deriv":True} if use_Dfun else {}        
-        model_result = model.fit(data=OD, t=time, params=params, weights=weights, fit_kws=fit_kws, method=method)
-        results[i] = model_result
+    models = list(models)
+    fit_kws = dict(t=time, y=OD, weights=weights, param_min=param_min, param_max=param_max, param_fix=param_fix, 
+        use_Dfun=use_Dfun, method=method)
+    full_model = curveball.baranyi_roberts_model.BaranyiRoberts
+    results = []
+    if full_model in models and len(models) > 1:
+        # the other models are restrictions of the full model, 
+        # so start them from its fit rather than from the heuristic guesses
+        models.remove(full_model)
+        results.append(_fit_one(full_model, param_guess=param_guess, picklable=n_jobs != 1, **fit_kws))
+        warm_guess = dict(results[0].best_values, **param_guess)
+    else:
+        warm_guess = param_guess
+    # the growth rate r of the full model only carries over to models that also have nu and a lag phase
+    guesses = [warm_guess if {'nu', 'q0'} <= set(_get_model(model_class).param_names) else param_guess for model_class in models]
+    fit_one = functools.partial(_fit_one, picklable=n_jobs != 1, **fit_kws)
+    if n_jobs == 1:
+        # the nested models revisit each other's parameter values, so share their model evaluations
+        with curveball.baranyi_roberts_model._cached_evaluations(time):
+            results += [fit_one(model_class, guess) for model_class, guess in zip(models, guesses)]
+    else:
+        with ProcessPoolExecutor(max_workers=None if n_jobs < 0 else n_jobs) as executor:
+            results += list(executor.map(fit_one, models, guesses))
 
     # sort by increasing BIC
     information_criteria_weights(results)
@@ -1194,38 +1639,8 @@ def fit_model(df, param_guess=None, param_min=None, param_max=None, param_fix=No
 
     if PRINT:
         print(results[0].fit_report(show_correl=False))
-    if PLOT:        
-        dy = df.OD.max() / 50.0
-        dx = df.Time.max() / 25.0
-        columns = min(3, len(results))
-        rows = int(np.ceil(len(results) / columns))
-        w = max(8, 4 * columns)
-        h = max(6, 3*rows)
-        fig, ax = plt.subplots(rows, columns, sharex=True, sharey=True, figsize=(w, h))
-        if not hasattr(ax, '__iter__'):
-            ax = np.array(ax, ndmin=2)
-        for i,fit in enumerate(results):
-            row = i // columns
-            col = i % columns
-            _ax = ax[row, col]
-            vals = fit.best_values
-            fit.plot_fit(ax=_ax, datafmt='.', data_kws={'alpha':0.3}, fit_kws={'lw': 4}, yerr=ODerr)
-            _ax.axhline(y=vals.get('y0', 0), color='k', ls='--')
-            _ax.axhline(y=vals.get('K', 0), color='k', ls='--')          
-            title = '%s %dp\nBIC: %.3f\ny0=%.2f, K=%.2f, r=%.2g\n' + r'$\nu$=%.2g, $q_0$=%.2g, v=%.2g'
-            title = title % (fit.model.name, fit.nvarys, fit.bic, vals.get('y0', np.nan), vals.get('K', np.nan), vals.get('r', np.nan), vals.get('nu', np.nan), vals.get('q0', np.nan), vals.get('v', np.nan))
-            _ax.set_title(title)
-            _ax.get_legend().set_visible(False)
-            _ax.set_xlabel('')
-            _ax.set_ylabel('')
-            if col == 0:
-                _ax.set_ylabel('OD')
-            if row == rows - 1:
-                _ax.set_xlabel('Time')
-        _ax.set_xlim(0, 1.1 * df.Time.max())
-        _ax.set_ylim(0.9 * df.OD.min(), 1.1 * df.OD.max())
-        sns.despine()
-        fig.tight_layout()
+    if PLOT:
+        fig, ax = plot_fits(results)
         return results, fig, ax
     return results
 
@@ -1236,6 +1651,7 @@ if __name__ == '__main__':
 
     # fit models to growth curves
     results, fig, ax = fit_model(df, use_Dfun=True, PLOT=True, PRINT=True)    
+    plt, sns = _plotting()
     plt.savefig('test_models.png')
     plt.show()
 
@@ -23,9 +23,21 @@ import seaborn as sns
 sns.set_style("ticks")
 
 from matplotlib.patches import RegularPolygon
+from matplotlib.collections import PatchCollection
 from string import ascii_uppercase
 
 
+def _color_palette(data):
+	"""The colors of the ``Color`` column of `data`, in order of appearance, with white replaced by black.
+
+	The colors are returned as an object array, also when ``Color`` is categorical (see :py:mod:`curveball.ioutils`),
+	so that white can be replaced.
+	"""
+	palette = np.asarray(data.Color.unique(), dtype=object)
+	palette[palette == '#ffffff'] = '#000000'
+	return palette
+
+
 def plot_wells(df, x='Time', y='OD', plot_func=plt.plot, output_filename=None):
 	"""Plot a grid of plots, one for each well in the plate.
 
@@ -54,9 +66,8 @@ def plot_wells(df, x='Time', y='OD', plot_func=plt.plot, output_filename=None):
 	"""
 	if 'Strain' in df:
 		hue = 'Strain'
-		palette = df.Color.unique() if 'Color' in df else sns.color_palette()
+		palette = _color_palette(df) if 'Color' in df else sns.color_palette()
 		hue_order = df.Strain.unique()
-		palette[palette == '#ffffff'] = '#000000'
 	else:
 		hue = 'Well'
 		palette = sns.color_palette()
@@ -116,8 +127,7 @@ def plot_strains(data, x='Time', y='OD', plot_func=plt.plot, by=None, agg_func=n
 		raised if `by` isn't set and `data` doesn't contain ``Strain`` and either ``Time`` or ``Cycle Nr.``.
 	"""
 	if 'Color' in data:
-		palette = data.Color.unique()
-		palette[palette == '#ffffff'] = '#000000'
+		palette = _color_palette(data)
 	else:
 		palette = color or sns.color_palette()
 	if by is None:
@@ -128,7 +138,8 @@ def plot_strains(data, x='Time', y='OD', plot_func=plt.plot, by=None, agg_func=n
 		else:
 			raise ValueError("If by is not set then data must have column Strain and either Time or Cycle Nr.")
 		
-	grp = data.groupby(by=by)
+	# observed: only strains that are in the data, also when Strain is categorical
+	grp = data.groupby(by=by, observed=True)
 	agg = grp.aggregate(agg_func).reset_index()
 	g = sns.FacetGrid(agg, hue=hue, size=5, aspect=1.5, palette=palette, hue_order=data[hue].unique())
 	g.map(plot_func, x, y);
@@ -175,8 +186,7 @@ def tsplot(data, x='Time', y='OD', ci_level=95, ax=None, color=None, output_file
 	else:
 		condition = 'Well'
 	if 'Color' in data:
-		palette = data.Color.unique()
-		palette[palette == '#ffffff'] = '#000000'
+		palette = _color_palette(data)
 	else: 
 		palette = color or sns.color_palette()
 
@@ -209,7 +219,7 @@ def plot_plate(data, edge_color='#888888', output_filename=None):
 	ax : numpy.ndarray
 		array of axis objects.
 	"""
-	plate = data.pivot('Row', 'Col', 'Color').as_matrix()
+	plate = data.pivot(index='Row', columns='Col', values='Color').values
 	height, width = plate.shape
 	fig = plt.figure(figsize=((width + 2.0) / 3.0, (height + 2.0) / 3.0))
 	ax = fig.add_axes((0.05, 0.05, 0.9, 0.9),
@@ -220,16 +230,16 @@ def plot_plate(data, edge_color='#888888', output_filename=None):
 	    axis.set_major_formatter(plt.NullFormatter())
 	    axis.set_major_locator(plt.NullLocator())
 
-	# Create the grid of squares
-	squares = np.array([[RegularPolygon((i + 0.5, j + 0.5),
-	                                         numVertices=4,
-	                                         radius=0.5 * np.sqrt(2),
-	                                         orientation=old_div(np.pi, 4),
-	                                         ec=edge_color,
-	                                         fc=plate[height-1-j,i])
-	                          for j in range(height)]
-	                         for i in range(width)])
-	[ax.add_patch(sq) for sq in squares.flat]
+	# Create the grid of squares as a single collection, colored column by column from the bottom row
+	squares = PatchCollection([RegularPolygon((i + 0.5, j + 0.5),
+	                                          numVertices=4,
+	                                          radius=0.5 * np.sqrt(2),
+	                                          orientation=old_div(np.pi, 4))
+	                           for i in range(width)
+	                           for j in range(height)],
+	                          facecolors=plate[::-1].T.ravel(),
+	                          edgecolors=edge_color)
+	ax.add_collection(squares)
 	ax.set_xticks(np.arange(width) + 0.5)
 	ax.set_xticklabels(np.arange(1, 1 + width))
 	ax.set_yticks(np.arange(height) + 0.5)
@@ -367,7 +377,7 @@ def plot_residuals(df, time='Time', value='OD', resid_func=lambda x: x - x.mean(
 	w, h= plt.rcParams['figure.figsize']
 	fig,ax = plt.subplots(1, 3, figsize=(w * 3, h))
 
-	residuals = df.groupby(time)[value].transform(resid_func).as_matrix()
+	residuals = df.groupby(time)[value].transform(resid_func).values
 
 	ax[0].plot(df[time], residuals, ls='', marker='o', color=color)
 	ax[0].set(xlabel=time, ylabel='Residuals')	
@@ -376,7 +386,7 @@ def plot_residuals(df, time='Time', value='OD', resid_func=lambda x: x - x.mean(
 	ax[1].set(xlabel='Residuals', ylabel='Frequency')
 	
 	sigmas = df.groupby(time)[value].std()	
-	linreg = scipy.stats.linregress(sigmas.as_matrix()[:-1], sigmas.as_matrix()[1:])
+	linreg = scipy.stats.linregress(sigmas.values[:-1], sigmas.values[1:])
 	eq = r'$\sigma_{{t+1}} = {:.2g} + {:.2g} \sigma_{{t}}$'.format(linreg.intercept, linreg.slope)
 	sigma_range = np.linspace(sigmas.min(), sigmas.max())
 	ax[2].plot(sigma_range, sigma_range, color='k', ls='--', label=r'$\sigma_{t+1}=\sigma_{t}$')
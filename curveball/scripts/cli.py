@@ -13,13 +13,17 @@ import os.path
 import pkg_resources
 import glob
 import warnings
+import zipfile
+import hashlib
+import collections
+from concurrent.futures import ProcessPoolExecutor
 # catch some future warnings, mostly caused by matplotlib
 warnings.simplefilter(action="ignore", category=FutureWarning)
 import curveball
 import numpy as np
 import pandas as pd
 import click
-import xlrd
+from openpyxl.utils.exceptions import InvalidFileException
 import matplotlib.pyplot as plt
 import seaborn as sns
 sns.set_style("ticks")
@@ -35,6 +39,9 @@ file_extension_handlers = {
 	'.xlsx': curveball.ioutils.read_tecan_xlsx,
 	'.csv': curveball.ioutils.read_curveball_csv,
 }
+# model fitting results of the strains most recently analysed in this process, least recently used first; see _fit_strain
+_FIT_RESULTS = collections.OrderedDict()
+_FIT_RESULTS_MAXSIZE = 8
 
 
 def echo_error(message):
@@ -213,15 +220,21 @@ def plate(plate_folder, plate_file, output_file, list, show):
 @click.option('--weights/--no-weights', default=False, help="use weights for the fitting procedure")
 @click.option('--ci/--no-ci', default=False, help="find confidence intervals for lag and max growth rate")
 @click.option('--nsamples', default=1000, help="number of bootstrap samples to use, only applicable when using --ci")
+@click.option('--method', default='leastsq', type=click.Choice(['leastsq', 'least_squares']), help="fitting method: Levenberg-Marquardt (leastsq) or trust region reflective with native bounds (least_squares)")
+@click.option('--model_jobs', default=1, help="number of processes fitting the models of each strain in parallel, -1 for the number of CPUs; can't be used with --file_jobs")
+@click.option('--cache/--no-cache', default=None, help="reuse parsed data files from the cache folder, defaults to the CURVEBALL_CACHE environment variable")
+@click.option('--file_jobs', default=1, help="number of files processed in parallel, -1 for the number of CPUs; can't be used with --model_jobs")
 @cli.command()
-def analyse(path, output_file, plate_folder, plate_file, blank_strain, ref_strain, max_time, guess, param_min, param_max, param_fix, weights, ci, nsamples):
+def analyse(path, output_file, plate_folder, plate_file, blank_strain, ref_strain, max_time, guess, param_min, param_max, param_fix, weights, ci, nsamples, method, model_jobs, cache, file_jobs):
 	"""Analyse growth curves data using Curveball.
 
 	To get help for the parameters, run:
 
 	>>> curveball plate --help
 	"""
-	results = []
+	if file_jobs != 1 and model_jobs != 1:
+		# each file worker would start its own model workers, oversubscribing the CPUs
+		raise click.UsageError("--file_jobs and --model_jobs can't be used together, set one of them to 1")
 	if plate_file is None:
 		if VERBOSE:
 			click.echo('- Plate file not provided; processing precleaned file%s' % click.format_filename(path))
@@ -230,7 +243,7 @@ def analyse(path, output_file, plate_folder, plate_file, blank_strain, ref_strai
 	else:
 		plate_path = find_plate_file(plate_folder, plate_file)
 		plate = load_plate(plate_path)
-		plate.Strain = list(map(str, plate.Strain))
+		plate.Strain = plate.Strain.astype(str)
 		plate_strains = plate.Strain.unique().tolist()
 
 	if VERBOSE:
@@ -255,18 +268,85 @@ def analyse(path, output_file, plate_folder, plate_file, blank_strain, ref_strai
 	if not files:
 		raise click.ClickException("No data files found in folder {0}".format(click.format_filename(path)))
 
-	with click.progressbar(files, label='Processing files:', item_show_func=get_filename, color='green') as bar:
-		for filepath in bar:
-			file_results = _process_file(filepath, plate, blank_strain, ref_strain, max_time, guess, param_min, param_max, param_fix, weights, ci, nsamples)
-			results.extend(file_results)
+	args = (plate, blank_strain, ref_strain, max_time, guess, param_min, param_max, param_fix, weights, ci, nsamples, method, model_jobs, cache)
+	# the results are written to an output file as soon as each data file is analysed, so that a failure doesn't lose the files already analysed;
+	# the standard output also shows the progress messages, so the results are written to it at the end
+	stream = output_file.name != '-'
+	results, columns = [], None
+	if file_jobs == 1:
+		with click.progressbar(files, label='Processing files:', item_show_func=get_filename, color='green') as bar:
+			for filepath in bar:
+				results.extend(_process_file(filepath, *args))
+				if stream:
+					columns = _write_results(results, output_file, columns)
+					results = []
+	else:
+		# the files are independent; results are collected in file order so that the output does not depend on the scheduling
+		with ProcessPoolExecutor(max_workers=None if file_jobs < 0 else file_jobs, initializer=_set_options, initargs=(VERBOSE, PLOT)) as executor:
+			futures = [executor.submit(_process_file, filepath, *args) for filepath in files]
+			with click.progressbar(futures, label='Processing files:', color='green') as bar:
+				for future in bar:
+					results.extend(future.result())
+					if stream:
+						columns = _write_results(results, output_file, columns)
+						results = []
+	_write_results(results, output_file, columns)
 
-	output_table = pd.DataFrame(results)
-	output_table.to_csv(output_file, index=False)
 	if VERBOSE and output_file.name != '-':
 		click.secho("Wrote output to %s" % output_file.name, fg='green')
 
 
-def _process_file(filepath, plate, blank_strain, ref_strain, max_time, guess, param_min, param_max, param_fix, weights, ci, nsamples):
+def _write_results(results, output_file, columns=None):
+	"""Appends results to the output csv file.
+
+	The header is written with the first results, which set the columns of the output file;
+	`columns` are the columns returned by the previous call, or ``None`` if nothing was written yet.
+	"""
+	if not results:
+		return columns
+	output_table = pd.DataFrame(results)
+	if columns is None:
+		columns = output_table.columns.tolist()
+		output_table.to_csv(output_file, index=False)
+	else:
+		output_table.reindex(columns=columns).to_csv(output_file, index=False, header=False)
+	output_file.flush()
+	return columns
+
+
+def _set_options(verbose, plot):
+	"""Sets the global options of :py:func:`cli` in a worker process of :py:func:`analyse`.
+	"""
+	global VERBOSE
+	VERBOSE = verbose
+	global PLOT
+	PLOT = plot
+
+
+def _fit_strain(strain_df, n_jobs=1, **kwargs):
+	"""Fits the models to the growth curves of a strain, reusing the results of identical curves fitted with the same options.
+
+	Repeated files, or strains with the same measurements in different files, are fitted once per process,
+	as long as they are among the last :py:data:`_FIT_RESULTS_MAXSIZE` distinct strains fitted.
+	Returns a new list of the model fitting results on every call.
+	"""
+	data = strain_df[['Time', 'OD']].sort_values(by=['Time', 'OD'])
+	h = hashlib.blake2b(digest_size=16)
+	h.update(data.values.astype(float).tobytes())
+	h.update(repr(sorted(kwargs.items())).encode())
+	key = h.hexdigest()
+	if key in _FIT_RESULTS:
+		_FIT_RESULTS.move_to_end(key)
+		echo_info("Growth curves already fitted, reusing the results")
+	else:
+		if len(_FIT_RESULTS) >= _FIT_RESULTS_MAXSIZE:
+			_FIT_RESULTS.popitem(last=False)
+		_FIT_RESULTS[key] = curveball.models.fit_model(strain_df, n_jobs=n_jobs, PLOT=False, PRINT=VERBOSE, **kwargs)
+	# a new list, so that callers can't change the memoized results
+	return list(_FIT_RESULTS[key])
+
+
+def _process_file(filepath, plate, blank_strain, ref_strain, max_time, guess, param_min, param_max, param_fix, weights, ci, nsamples, method=u'leastsq', n_jobs=1, cache=None):
 	"""Analyses a single growth curves file.
 
 	See also
@@ -282,12 +362,12 @@ def _process_file(filepath, plate, blank_strain, ref_strain, max_time, guess, pa
 		return results
 	try:
 		if np.isfinite(max_time):
-			df = handler(filepath, plate=plate, max_time=max_time)
+			df = handler(filepath, plate=plate, max_time=max_time, cache=cache)
 		else:
-			df = handler(filepath, plate=plate)
+			df = handler(filepath, plate=plate, cache=cache)
 	except IOError as e:
 		ioerror_to_click_exception(e)
-	except xlrd.biffh.XLRDError as e:
+	except (InvalidFileException, zipfile.BadZipFile) as e:
 		raise click.FileError(filepath, hint="parser error, probably not a {1} file, {0}".format(e.args[0], ext))
 	try:
 		strains = plate.Strain.unique().tolist()
@@ -328,14 +408,13 @@ def _process_file(filepath, plate, blank_strain, ref_strain, max_time, guess, pa
 
 	for strain in strains:
 		strain_df = df[df.Strain == strain]
-		_ = curveball.models.fit_model(strain_df, param_guess=guess, param_min=param_min, param_max=param_max, param_fix=param_fix, use_weights=weights, PLOT=PLOT, PRINT=VERBOSE)
+		fit_results = _fit_strain(strain_df, param_guess=guess, param_min=param_min, param_max=param_max, param_fix=param_fix, use_weights=weights, method=method, n_jobs=n_jobs)
 		if PLOT:
-			fit_results,fig,ax = _
+			# only the selected model is reported, so only it is plotted
+			fig, ax = curveball.models.plot_fits(fit_results, top_k=1)
 			strain_plot_fn = fn + ('_strain_%s.png' % strain)
 			fig.savefig(strain_plot_fn)
 			echo_info("Wrote strain %s plot to %s" % (strain, click.format_filename(strain_plot_fn)))
-		else:
-			fit_results = _
 
 		res = {}
 		fit = fit_results[0]
@@ -378,6 +457,8 @@ def _process_file(filepath, plate, blank_strain, ref_strain, max_time, guess, pa
 			res['K_low'] = low
 			res['K_high'] = high
 
+		# set for every strain, so that all the results have the same columns
+		res['w'] = np.nan
 		if strain == ref_strain:
 			ref_fit = fit
 			res['w'] = 1
@@ -49,7 +49,7 @@ setup(
         'future',
         'click',
         'lxml',
-        'xlrd',
+        'openpyxl>=2.6',
         'numpy',
         'scipy',
         'matplotlib',
@@ -70,6 +70,10 @@ setup(
             'sphinx>=1.3.0',
             'numpydoc',
             'sphinx_rtd_theme'
+        ],
+        'fast': [
+            'numba',
+            'numexpr'
         ]
     },
     entry_points={
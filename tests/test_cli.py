@@ -14,6 +14,7 @@ import os
 import glob
 import io
 import shutil
+import collections
 import pkg_resources
 import pandas as pd
 from click.testing import CliRunner # See reference on testing Click applications: http://click.pocoo.org/5/testing/
@@ -238,6 +239,36 @@ class AnalysisTestCase(TestCase):
 		self.assertTrue(is_csv(data))
 
 
+	def test_process_file_model_jobs(self):
+		result = self.runner.invoke(cli.cli, ['--no-plot', '--verbose', '--no-prompt', 'analyse', self.filepath, '--model_jobs=2', '--plate_file=G-RG-R.csv', '--ref_strain=G'])
+		self.assertEqual(result.exit_code, 0, "Code: {}\n{}".format(result.exit_code, result.output))
+		lines = [line for line in result.output.splitlines() if len(line) > 0] 
+		data = os.linesep.join(lines[-4:]) # only last 4 lines
+		self.assertTrue(is_csv(data))
+
+
+	def test_fit_strain_reuses_results(self):
+		df = curveball.models.randomize(random_seed=0)
+		results = cli._fit_strain(df, use_weights=False)
+		reused = cli._fit_strain(df.iloc[::-1], use_weights=False)
+		self.assertIsNot(reused, results)
+		self.assertTrue(all(a is b for a, b in zip(reused, results)))
+		self.assertIsNot(cli._fit_strain(df, use_weights=True)[0], results[0])
+
+
+	def test_fit_strain_maxsize(self):
+		fit_results, maxsize = cli._FIT_RESULTS, cli._FIT_RESULTS_MAXSIZE
+		cli._FIT_RESULTS, cli._FIT_RESULTS_MAXSIZE = collections.OrderedDict(), 1
+		try:
+			df = curveball.models.randomize(random_seed=0)
+			results = cli._fit_strain(df, use_weights=False)
+			cli._fit_strain(df, use_weights=True)
+			self.assertEqual(len(cli._FIT_RESULTS), 1)
+			self.assertIsNot(cli._fit_strain(df, use_weights=False)[0], results[0])
+		finally:
+			cli._FIT_RESULTS, cli._FIT_RESULTS_MAXSIZE = fit_results, maxsize
+
+
 	# this test works but takes too long (10 min) see #129
 	def test_process_file_with_ci(self):
 		result = self.runner.invoke(cli.cli, [
@@ -271,6 +302,35 @@ class AnalysisTestCase(TestCase):
 		self.assertTrue(is_csv(data), result.output)
 		
 
+	def test_process_folder_file_jobs(self):
+		num_files = len(self.files)
+		result = self.runner.invoke(cli.cli, ['--no-plot', '--verbose', '--no-prompt', 
+			'analyse', self.dirpath, '--file_jobs=2', '--plate_file=G-RG-R.csv', '--ref_strain=G'])
+		self.assertEqual(result.exit_code, 0, "Code: {}\n{}".format(result.exit_code, result.output))
+		lines = [line for line in result.output.splitlines() if len(line) > 0] 
+		num_lines =  num_files * 3 + 1
+		data = os.linesep.join(lines[-num_lines:])
+		self.assertTrue(is_csv(data), result.output)
+
+
+	def test_process_folder_file_jobs_and_model_jobs(self):
+		result = self.runner.invoke(cli.cli, ['--no-plot', '--no-prompt', 
+			'analyse', self.dirpath, '--file_jobs=2', '--model_jobs=-1', '--plate_file=G-RG-R.csv', '--ref_strain=G'])
+		self.assertNotEqual(result.exit_code, 0)
+		self.assertIn('--model_jobs', result.output)
+
+
+	def test_process_folder_output_file(self):
+		num_files = len(self.files)
+		output_file = os.path.join(self.dirpath, 'output.csv')
+		result = self.runner.invoke(cli.cli, ['--no-plot', '--verbose', '--no-prompt', 
+			'analyse', self.dirpath, '--output_file=' + output_file, '--plate_file=G-RG-R.csv', '--ref_strain=G'])
+		self.assertEqual(result.exit_code, 0, "Code: {}\n{}".format(result.exit_code, result.output))
+		df = pd.read_csv(output_file)
+		self.assertEqual(df.shape[0], num_files * 3)
+		self.assertEqual(df.columns[-1], 'w')
+
+
 	def test_path_not_found(self):
 		result = self.runner.invoke(cli.cli, ['analyse', 'untitled.xlsx'])
 		self.assertNotEquals(result.exit_code, 0)
@@ -40,6 +40,25 @@ class CurveballCSVTestCase(TestCase):
         df1 = pd.read_csv(fn)
         pd.util.testing.assert_frame_equal(df, df1, check_dtype=False)
 
+    def test_parse_wells(self):
+        wells = pd.Series(['B12', 'A1', 'B12', 'H3'])
+        rows, cols = curveball.ioutils._parse_wells(wells)
+        self.assertEqual(list(rows), ['B', 'A', 'B', 'H'])
+        self.assertEqual(list(rows.categories), ['A', 'B', 'H'])
+        self.assertEqual(cols.tolist(), [12, 1, 12, 3])
+
+    def test_read_curveball_csv_cache(self):
+        cache_dir = curveball.ioutils.CACHE_DIR
+        curveball.ioutils.CACHE_DIR = tempfile.mkdtemp()
+        try:
+            df = curveball.ioutils.read_curveball_csv(self.filename, cache=True)
+            self.assertEqual(len(os.listdir(curveball.ioutils.CACHE_DIR)), 1)
+            df1 = curveball.ioutils.read_curveball_csv(self.filename, cache=True)
+            pd.util.testing.assert_frame_equal(df, df1)
+        finally:
+            shutil.rmtree(curveball.ioutils.CACHE_DIR)
+            curveball.ioutils.CACHE_DIR = cache_dir
+
 
 class TecanXLSXTestCase(TestCase):
     def setUp(self):
@@ -74,6 +93,18 @@ class TecanXLSXTestCase(TestCase):
         self.assertEqual(df.shape, (8544, 9))
         self.assertEqual(df.columns.tolist() , ['Time', u'Temp. [\xb0C]', 'Cycle Nr.', 'Well', 'OD', 'Row', 'Col', 'Strain', 'Color'])
 
+    def test_read_tecan_xlsx_cache(self):
+        cache_dir = curveball.ioutils.CACHE_DIR
+        curveball.ioutils.CACHE_DIR = tempfile.mkdtemp()
+        try:
+            df = curveball.ioutils.read_tecan_xlsx(self.filename, 'OD', plate=self.plate, cache=True)
+            self.assertEqual(len(os.listdir(curveball.ioutils.CACHE_DIR)), 1)
+            df1 = curveball.ioutils.read_tecan_xlsx(self.filename, 'OD', plate=self.plate, cache=True)
+            pd.util.testing.assert_frame_equal(df, df1)
+        finally:
+            shutil.rmtree(curveball.ioutils.CACHE_DIR)
+            curveball.ioutils.CACHE_DIR = cache_dir
+
 
 class BioTekXLSXTestCase(TestCase):
     def setUp(self):
@@ -120,14 +151,12 @@ class SunriseTestCase(TestCase):
         self.assertEqual(df.shape, (96, 8))
         self.assertEqual(sorted(df.columns.tolist()) , sorted([u'Time', u'Well', u'OD', u'Row', u'Col', 'Strain', 'Color', 'Filename']))
 
-    # commented out 18JUN19 due to travis-ci failure:
-    # ValueError: You are trying to merge on object and int64 columns. If you wish to proceed you should use pd.concat
-    # def test_read_sunrise_xlsx_plate(self):
-    #     df = curveball.ioutils.read_sunrise_xlsx(self.filename, plate=self.plate)
-    #     self.assertIsNotNone(df)
-    #     self.assertIsInstance(df, pd.DataFrame)
-    #     self.assertEqual(df.shape, (96, 8))
-    #     self.assertEqual(sorted(df.columns.tolist()) , sorted([u'Time', u'Well', u'OD', u'Row', u'Col', 'Strain', 'Color', 'Filename']))
+    def test_read_sunrise_xlsx_plate(self):
+        df = curveball.ioutils.read_sunrise_xlsx(self.filename, plate=self.plate)
+        self.assertIsNotNone(df)
+        self.assertIsInstance(df, pd.DataFrame)
+        self.assertEqual(df.shape, (96, 8))
+        self.assertEqual(sorted(df.columns.tolist()) , sorted([u'Time', u'Well', u'OD', u'Row', u'Col', 'Strain', 'Color', 'Filename']))
 
 
 class MatTestCase(TestCase):
@@ -10,7 +10,7 @@
 from __future__ import division
 from builtins import str
 from past.utils import old_div
-from unittest import TestCase, main
+from unittest import TestCase, main, skipIf, skipUnless
 
 import sys
 import os
@@ -98,6 +98,130 @@ class FunctionsTestCase(TestCase):
 		self.assertTrue(err < 1e-6)
 
 
+	def test_baranyi_roberts_loop(self):
+		y0=0.1; r=0.75; K=1.0; nu=0.5; q0=0.1; v=0.1
+		t = np.linspace(0,12)
+		y_curve = np.empty_like(t)
+		curveball.baranyi_roberts_model._baranyi_roberts_loop(t, y0, r, K, nu, q0, v, True, y_curve)
+		y_ode = odeint(baranyi_roberts_ode, y0, t, args=(r, K, nu, q0, v))
+		y_ode.resize((len(t),))
+		err = compare_curves(y_ode, y_curve)
+		self.assertTrue(err < 1e-6)
+
+
+	def test_logistic_loop(self):
+		y0=0.1; r=0.75; K=1.0; q0=0.1; v=0.1
+		t = np.linspace(0,12)
+		y_curve = np.empty_like(t)
+		curveball.baranyi_roberts_model._logistic_loop(t, y0, K, r, q0, v, True, y_curve)
+		y_ode = odeint(baranyi_roberts_ode, y0, t, args=(K, r, 1.0, q0, v))
+		y_ode.resize((len(t),))
+		err = compare_curves(y_ode, y_curve)
+		self.assertTrue(err < 1e-6)
+
+
+	@skipIf(curveball.baranyi_roberts_model.numexpr is None, "numexpr is not installed")
+	def test_baranyi_roberts_numexpr(self):
+		y0=0.1; r=0.75; K=1.0; nu=0.5; q0=0.1; v=0.1
+		t = np.linspace(0,12)
+		y_curve = curveball.baranyi_roberts_model._baranyi_roberts_numexpr(t, y0, r, K, nu, q0, v, True)
+		y_ode = odeint(baranyi_roberts_ode, y0, t, args=(r, K, nu, q0, v))
+		y_ode.resize((len(t),))
+		err = compare_curves(y_ode, y_curve)
+		self.assertTrue(err < 1e-6)
+
+
+	@skipUnless(curveball.baranyi_roberts_model.numba, "numba is not installed")
+	def test_baranyi_roberts_kernels(self):
+		brm = curveball.baranyi_roberts_model
+		t = np.linspace(0, 24, 200)
+		params = [
+			(0.1, 1.0, 0.75, 0.5, 0.1, 0.1),
+			(0.1, 1.0, 0.75, 1.0, 0.1, 0.1),
+			(0.1, 1.0, 0.75, 2.0, 1e-4, 50.0),
+			(0.1, 1.0, 0.75, 1.0, 1e-4, 50.0),
+			(0.1, 1.0, 0.75, 0.5, np.inf, np.inf),
+		]
+		for y0, K, r, nu, q0, v in params:
+			y_kernel = brm._baranyi_roberts_evaluate(t, y0, K, r, nu, q0, v)
+			kernel, numexpr = brm._baranyi_roberts_kernel, brm.numexpr
+			brm._baranyi_roberts_kernel, brm.numexpr = None, None
+			try:
+				y_numpy = brm._baranyi_roberts_evaluate(t, y0, K, r, nu, q0, v)
+			finally:
+				brm._baranyi_roberts_kernel, brm.numexpr = kernel, numexpr
+			np.testing.assert_allclose(y_kernel, y_numpy, rtol=1e-10)
+
+
+	def test_baranyi_roberts_float32(self):
+		y0=0.1; r=0.75; K=1.0; nu=0.5; q0=0.1; v=0.1
+		t = np.linspace(0,12)
+		y = curveball.baranyi_roberts_model.baranyi_roberts_function(t, y0, r, K, nu, q0, v)
+		y32 = curveball.baranyi_roberts_model.baranyi_roberts_function(t.astype(np.float32), y0, r, K, nu, q0, v)
+		self.assertEqual(y32.dtype, np.float32)
+		np.testing.assert_allclose(y32, y, rtol=1e-5)
+
+
+	def test_baranyi_roberts_scalar(self):
+		t = np.linspace(0,12)
+		param_sets = [(0.1, 1.0, 0.75, 0.5, 0.1, 0.1), (0.1, 1.0, 0.75, 2.0, np.inf, np.inf), (0.1, np.inf, 0.75, 1.0, 0.5, 0.5)]
+		for params in param_sets:
+			y = curveball.baranyi_roberts_model.baranyi_roberts_function(t, *params)
+			y_scalar = [curveball.baranyi_roberts_model.baranyi_roberts_function(ti, *params) for ti in t]
+			np.testing.assert_allclose(y_scalar, y)
+
+
+	def test_baranyi_roberts_cached_evaluations(self):
+		t = np.linspace(0,12)
+		params = (0.1, 1.0, 0.75, 0.5, 0.1, 0.1)
+		y = curveball.baranyi_roberts_model.baranyi_roberts_function(t, *params)
+		with curveball.baranyi_roberts_model._cached_evaluations(t):
+			y1 = curveball.baranyi_roberts_model.baranyi_roberts_function(t, *params)
+			y1[0] = -1 # returned arrays are copies of the cached evaluation
+			y2 = curveball.baranyi_roberts_model.baranyi_roberts_function(t, *params)
+			self.assertEqual(len(curveball.baranyi_roberts_model._eval_cache['values']), 1)
+		self.assertIsNone(curveball.baranyi_roberts_model._eval_cache)
+		np.testing.assert_array_equal(y2, y)
+
+
+	def test_baranyi_roberts_batch(self):
+		t = np.linspace(0,12)
+		param_sets = [(0.1, 1.0, 0.75, 0.5, 0.1, 0.1), (0.1, 1.0, 0.75, 2.0, np.inf, np.inf), (0.2, 0.8, 1.0, 1.0, 0.5, np.inf)]
+		y_batch = curveball.baranyi_roberts_model.baranyi_roberts_batch(t, *np.array(param_sets).T)
+		self.assertEqual(y_batch.shape, (len(param_sets), len(t)))
+		for y, params in zip(y_batch, param_sets):
+			np.testing.assert_allclose(y, curveball.baranyi_roberts_model.baranyi_roberts_function(t, *params))
+
+
+	def test_baranyi_roberts_derivative(self):
+		y0=0.1; r=0.75; K=1.0; nu=0.5; q0=0.1; v=0.1
+		t = np.linspace(0,12)
+		dydt = curveball.baranyi_roberts_model.baranyi_roberts_derivative(t, y0, K, r, nu, q0, v)
+		y = curveball.baranyi_roberts_model.baranyi_roberts_function(t, y0, K, r, nu, q0, v)
+		np.testing.assert_allclose(dydt, baranyi_roberts_ode(y, t, K, r, nu, q0, v))
+
+
+	def test_baranyi_roberts_jacobian(self):
+		params = dict(y0=0.1, K=1.0, r=0.75, nu=0.5, q0=0.1, v=0.1)
+		t = np.linspace(0,12)
+		jac = curveball.baranyi_roberts_model.baranyi_roberts_jacobian(t, **params)
+		for pname, value in params.items():
+			h = 1e-6 * value
+			y_plus = curveball.baranyi_roberts_model.baranyi_roberts_function(t, **dict(params, **{pname: value + h}))
+			y_minus = curveball.baranyi_roberts_model.baranyi_roberts_function(t, **dict(params, **{pname: value - h}))
+			np.testing.assert_allclose(jac[pname], (y_plus - y_minus) / (2 * h), rtol=1e-5, atol=1e-8, err_msg=pname)
+
+
+	def test_baranyi_roberts_jacobian_loop(self):
+		t = np.linspace(0,12)
+		for params in [(0.1, 1.0, 0.75, 0.5, 0.1, 0.1), (0.1, 1.0, 0.75, 2.0, np.inf, 0.75)]:
+			out = np.empty((6, len(t)))
+			curveball.baranyi_roberts_model._baranyi_roberts_jacobian_loop(t, *params, has_lag=np.isfinite(params[4]), out=out)
+			jac = curveball.baranyi_roberts_model.baranyi_roberts_jacobian(t, *params)
+			for row, pname in zip(out, ('y0', 'K', 'r', 'nu', 'q0', 'v')):
+				np.testing.assert_allclose(row, jac[pname], rtol=1e-10, atol=1e-12, err_msg=pname)
+
+
 class ModelSelectionTestCase(TestCase):
 	_multiprocess_can_split_ = True
 
@@ -128,6 +252,19 @@ class ModelSelectionTestCase(TestCase):
 		self.assertTrue(mean_residual(models[0]) < NOISE_STD)
 		
 
+	def test_plot_fits(self):
+		df = curveball.models.randomize(t=12, y0=0.1, K=1, r=0.75, nu=1, reps=REPS, noise_std=NOISE_STD, random_seed=RANDOM_SEED)
+		models = curveball.models.fit_model(df, PLOT=False, PRINT=False)
+		fig, ax = curveball.models.plot_fits(models, top_k=1)
+		self.assertIsInstance(fig, matplotlib.figure.Figure)
+		self.assertEqual(ax.size, 1)
+		folder = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, folder)
+		filename = os.path.join(folder, sys._getframe().f_code.co_name + ".png")
+		fig.savefig(filename)
+		self.assertTrue(check_image(filename))
+
+
 	def test_fit_model_logistic_with_param_min(self):
 		df = curveball.models.randomize(t=12, y0=0.1, K=1, r=0.75, nu=1, reps=REPS, noise_std=NOISE_STD, random_seed=RANDOM_SEED)       
 		models,fig,ax = curveball.models.fit_model(df, PLOT=True, PRINT=True, param_min={'y0': 0.2})
@@ -225,6 +362,14 @@ class ModelSelectionTestCase(TestCase):
 		self.assertTrue(mean_residual(models[0]) < NOISE_STD)
 
 
+	def test_fit_model_n_jobs(self):
+		df = curveball.models.randomize(t=12, y0=0.1, K=1, r=0.75, nu=1, reps=REPS, noise_std=NOISE_STD, random_seed=RANDOM_SEED)
+		models = curveball.models.fit_model(df, PLOT=False, PRINT=False)
+		models_parallel = curveball.models.fit_model(df, n_jobs=2, PLOT=False, PRINT=False)
+		self.assertEqual([mod.model.name for mod in models], [mod.model.name for mod in models_parallel])
+		np.testing.assert_allclose([mod.bic for mod in models], [mod.bic for mod in models_parallel])
+
+
 class FindKTestCase(TestCase):
 	_multiprocess_can_split_ = True
 
@@ -295,7 +440,18 @@ class FindLagTestCase(TestCase):
 			params = model.guess(data=y, t=t)
 			result = model.fit(data=y, t=t, params=params)
 			lam = curveball.models.find_lag(result)
-			self.assertTrue(lam < 1, "Lambda is " + str(lam))
+			_t = np.linspace(0, 12, 10001)
+			def tangent_lag(_y):
+				# tangent at the point of maximum growth rate, found numerically on a fine grid
+				dydt = np.gradient(_y, _t)
+				i = dydt.argmax()
+				return _t[i] + (_y[0] - _y[i]) / dydt[i]
+			# the closed form, against the fitted curve
+			_lam = tangent_lag(result.eval(t=_t))
+			self.assertAlmostEqual(lam, _lam, delta=1e-3, msg="Lambda is " + str(lam) + " but should be " + str(_lam))
+			# the fit, against the noiseless curve
+			_lam = tangent_lag(curveball.baranyi_roberts_model.baranyi_roberts_function(_t, y0=0.1, K=1, r=0.75, nu=nu, q0=np.inf, v=np.inf))
+			self.assertAlmostEqual(lam, _lam, delta=0.1, msg="Lambda is " + str(lam) + " but should be " + str(_lam))
 	
 
 	def test_find_lag_baranyi_roberts(self):
@@ -311,6 +467,25 @@ class FindLagTestCase(TestCase):
 				lam = curveball.models.find_lag(result)			      
 				self.assertTrue((_lam + 1) > lam > (_lam - 1), "Lambda is " + str(lam) + " but should be " + str(_lam))
 
+	def test_find_lag_loop(self):
+		for model_class, kwargs in [(curveball.baranyi_roberts_model.Logistic, {}), (curveball.baranyi_roberts_model.BaranyiRoberts, dict(nu=2.0, q0=0.05, v=0.75))]:
+			t, y = curveball.models.randomize(t=16, y0=0.1, K=1, r=0.75, reps=REPS, noise_std=NOISE_STD, random_seed=RANDOM_SEED, as_df=False, **kwargs)
+			model = model_class()
+			params = model.guess(data=y, t=t)
+			result = model.fit(data=y, t=t, params=params)
+			param_samples = pd.DataFrame([result.best_values, params.valuesdict()])
+			lags = np.empty(len(param_samples))
+			_t = np.linspace(t.min(), t.max())
+			values = curveball.models._baranyi_roberts_samples(result, param_samples)
+			curveball.baranyi_roberts_model._find_lag_loop(_t, values, lags)
+			np.testing.assert_allclose(curveball.baranyi_roberts_model._find_lag_batch(_t, values), lags)
+			for lam, (_, sample) in zip(lags, param_samples.iterrows()):
+				_params = result.params.copy()
+				for k,v in sample.items():
+					_params[k].set(value=v)
+				self.assertAlmostEqual(lam, curveball.models.find_lag(result, params=_params))
+
+
 	### fails because find_lag_ci depends on sample_params which fails when covar is weird?
 	# def test_find_lag_ci_baranyi_roberts(self):        
 	# 	t = np.linspace(0, 24)
@@ -455,6 +630,22 @@ class FindMaxGrowthTestCase(TestCase):
 		self.assertTrue(relative_error(r * (1 - (y0 / K)**nu), mu) < 1, "mu=%.4g, r(1-(y0/K)**nu)=%.4g" % (mu, r * (1 - (y0 / K)**nu)))
 
 
+	def test_analytic_max_growth_richards(self):
+		y0, K, r, nu = 0.1, 1.0, 0.75, 0.5
+		model = curveball.baranyi_roberts_model.Richards()
+		params = model.make_params(y0=y0, K=K, r=r, nu=nu)
+		t1, y1, a, t2, y2, mu = model.analytic_max_growth(params, 0, 12)
+		t = np.linspace(0, 12, 10001)
+		dydt = model.eval_derivative(params, t)
+		self.assertAlmostEqual(a, dydt.max(), places=6)
+		self.assertAlmostEqual(t1, t[dydt.argmax()], places=2)
+		self.assertAlmostEqual(y1, K * (nu + 1)**(-1.0 / nu))
+		self.assertEqual(t2, 0)
+		self.assertAlmostEqual(y2, y0)
+		self.assertAlmostEqual(mu, r * (1 - (y0 / K)**nu))
+		self.assertIsNone(model.analytic_max_growth(params, 0, 1))
+
+
 class LRTestTestCase(TestCase):
 	_multiprocess_can_split_ = True
 
@@ -641,6 +832,13 @@ class OutliersTestCase(TestCase):
 		self.assertTrue( (distances > 0).all(), msg=D.values() )
 
 
+	def test_cooks_distance_n_jobs(self):
+		D = curveball.models.cooks_distance(self.df, self.model_fit)
+		D_parallel = curveball.models.cooks_distance(self.df, self.model_fit, n_jobs=2)
+		self.assertEqual(sorted(D.keys()), sorted(D_parallel.keys()))
+		np.testing.assert_allclose([D[well] for well in sorted(D)], [D_parallel[well] for well in sorted(D)])
+
+
 	def test_find_outliers(self):		
 		outliers,fig,ax = curveball.models.find_outliers(self.df, self.model_fit, PLOT=True)
 		self.assertIsInstance(fig, matplotlib.figure.Figure)
@@ -690,6 +888,18 @@ class SamplingTestCase(TestCase):
 		self.assertEqual(sample_params.shape, (100, 3))
 
 
+	def test_sample_params_array(self):
+		t, y = curveball.models.randomize(t=12, y0=0.1, K=1, r=0.75, nu=1.0, reps=1, noise_std=NOISE_STD, random_seed=RANDOM_SEED, as_df=False)
+		model = curveball.baranyi_roberts_model.Logistic()
+		params = model.guess(data=y, t=t, param_fix={'y0'})
+		model_fit = model.fit(data=y, t=t, params=params)
+		samples, names = curveball.models._sample_params_array(model_fit, 100)
+		self.assertIsInstance(samples, np.ndarray)
+		self.assertEqual(samples.shape, (100, 3))
+		self.assertEqual(names, ['K', 'r', 'y0'])
+		self.assertTrue((samples[:, 2] == model_fit.params['y0'].value).all())
+
+
 	def test_sample_params_with_covar(self):
 		t, y = curveball.models.randomize(t=12, y0=0.1, K=1, r=0.75, nu=1.0, reps=1, noise_std=NOISE_STD, random_seed=RANDOM_SEED, as_df=False)
 		model = curveball.baranyi_roberts_model.Logistic()
@@ -747,6 +957,21 @@ class WeightsTestCase(TestCase):
 		self.assertTrue(len(weights) == df.shape[0])
 
 
+	def test_deviations(self):
+		df = curveball.models.randomize(t=12, y0=0.1, K=1, r=0.75, nu=1.0, reps=5, noise_std=NOISE_STD, random_seed=RANDOM_SEED)
+		df = df.sample(frac=1, random_state=RANDOM_SEED)
+		deviations = curveball.models._deviations(pd.factorize(df.Time)[0], df.OD.values)
+		np.testing.assert_allclose(deviations, df.groupby('Time').OD.transform('std').values)
+
+
+	def test_weights_from_deviations(self):
+		deviations = np.array([0.5, 0.0, 0.25, 0.0])
+		weights = curveball.models._weights_from_deviations(deviations)
+		np.testing.assert_array_equal(weights, [2.0, 4.0, 4.0, 4.0])
+		self.assertIsNone(curveball.models._weights_from_deviations(np.array([0.5, np.nan])))
+		self.assertIsNone(curveball.models._weights_from_deviations(np.zeros(3)))
+
+
 class IssuesTestCase(TestCase):
 	'''Tests that came up from bugs and other issues.
 
@@ -798,6 +1023,17 @@ class IssuesTestCase(TestCase):
 			self.assertIsInstance(result, ModelResult)
 
 
+	def test_jac_works(self):
+		t, y = curveball.models.randomize(as_df=False)
+		for model_class in curveball.models.get_models(curveball.baranyi_roberts_model):
+			model = model_class()
+			params = model.guess(data=y, t=t)
+			jac = curveball.models.make_jac(model, params, t)
+			result = model.fit(data=y, t=t, params=params, method='least_squares', fit_kws={'jac': jac})
+			self.assertIsInstance(result, ModelResult)
+			self.assertTrue(result.success)
+
+
 	def test_is_model(self):
 		for model in curveball.models.get_models(curveball.baranyi_roberts_model):
 			self.assertTrue(curveball.models.is_model(model))
@@ -815,5 +1051,20 @@ class IssuesTestCase(TestCase):
 		self.assertEqual(res.shape, (len(params), len(t)))
 
 
+	def test_sympy_jacobian(self):
+		model = curveball.baranyi_roberts_model.BaranyiRoberts()
+		params = model.make_params(y0=0.1, K=1, r=1, nu=1, v=1, q0=1)
+		params['nu'].vary = False
+		t, y = curveball.models.randomize(as_df=False)
+		jacobian, arg_names = curveball.models._sympy_jacobian(model, params)
+		self.assertIs(curveball.models._sympy_jacobian(model, params)[0], jacobian)
+		jac = model.eval_jacobian(params, t)
+		res = jacobian(t, *[params[name].value for name in arg_names])
+		varying = [name for name, par in params.items() if par.vary]
+		self.assertEqual(len(res), len(varying))
+		for name, dydx in zip(varying, res):
+			np.testing.assert_allclose(dydx, jac[name], rtol=1e-6, atol=1e-12)
+
+
 if __name__ == '__main__':
 	main()
@@ -68,6 +68,21 @@ class PlotsTestCase(TestCase):
 			self.check_image()
 
 
+	def test_plot_plate_with_plate(self):
+		plate = pd.read_csv(pkg_resources.resource_filename("plate_templates", "G-RG-R.csv"))
+		df = curveball.ioutils.read_tecan_xlsx(pkg_resources.resource_filename("data", "Tecan_280715.xlsx"), plate=plate)
+		fig, ax = curveball.plots.plot_plate(df.drop_duplicates('Well'), output_filename=self.output_filename)
+		self.assertIsInstance(fig, matplotlib.figure.Figure)
+		self.check_image()
+
+
+	def test_color_palette_with_plate(self):
+		plate = pd.read_csv(pkg_resources.resource_filename("plate_templates", "G-RG-R.csv"))
+		df = curveball.ioutils.read_tecan_xlsx(pkg_resources.resource_filename("data", "Tecan_280715.xlsx"), plate=plate)
+		palette = curveball.plots._color_palette(df)
+		self.assertEqual(sorted(palette), sorted(['#000000', '#4daf4a', '#e41a1c', '#377eb8']))
+
+
 	def test_tsplot(self):
 		df = pd.read_csv(pkg_resources.resource_filename("data", "Tecan_210115.csv"))		
 		g = curveball.plots.tsplot(df, output_filename=self.output_filename)